@@ -0,0 +1,52 @@
+import argparse
+import sys
+
+from main import DB_NAME, HOST, PASSWORD, PORT, SCHEMA_NAME, USERNAME, filling_order
+from postgres_orm.benchmark import compare_results, load_results, run_benchmark, save_results
+
+STRATEGIES = (
+    {"load_method": "insert", "commit_policy": "batch"},
+    {"load_method": "copy", "commit_policy": "batch"},
+    {"load_method": "copy", "commit_policy": "table"}
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill every table of filling_order and report per table throughput")
+    parser.add_argument("--scale-factors", type=float, nargs="+", default=[0.01, 0.1])
+    parser.add_argument("--load-methods", nargs="+", default=None, help="only run the strategies using these load methods")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--truncate", action="store_true", help="empty the schema before every run, it is never done implicitly")
+    args = parser.parse_args()
+
+    strategies = [strategy for strategy in STRATEGIES if args.load_methods is None or strategy["load_method"] in args.load_methods]
+
+    results = run_benchmark(
+        {
+            "host": HOST,
+            "port": PORT,
+            "username": USERNAME,
+            "password": PASSWORD,
+            "db_name": DB_NAME,
+            "schema_name": SCHEMA_NAME
+        },
+        filling_order,
+        args.scale_factors,
+        strategies,
+        truncate=args.truncate
+    )
+    save_results(results, args.output)
+
+    for run in results["runs"]:
+        print(f'\n{run["load_method"]}/{run["commit_policy"]} at SF {run["scale_factor"]}: {run["rows"]} rows in {run["seconds"]:.2f}s, {run["rows_per_second"]} rows/s, peak {run["peak_rss_mb"]} MB')
+        print(f'{"table":<20}{"rows":>10}{"rows/s":>12}{"round trips":>14}{"commits":>10}{"cpu s":>10}{"rss MB":>10}')
+        for result in run["tables"]:
+            print(f'{result["table"]:<20}{result["rows"]:>10}{result["rows_per_second"] or 0:>12}{result["round_trips"]:>14}{result["commits"]:>10}{result["cpu_seconds"]:>10.2f}{result["peak_rss_mb"]:>10}')
+
+    if args.baseline:
+        regressions = compare_results(load_results(args.baseline), results, args.tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+
+        sys.exit(1 if regressions else 0)
@@ -6,15 +6,10 @@ USERNAME = ""
 PASSWORD = ""
 DB_NAME = ""
 SCHEMA_NAME = ""
-
-orm = PostgresORM(
-    host=HOST,
-    port=PORT,
-    username=USERNAME,
-    password=PASSWORD,
-    db_name=DB_NAME,
-    schema_name=SCHEMA_NAME
-)
+# 1 gives 10 airlines, 5 000 departures and 750 000 bookings, every table grows linearly with it
+SCALE_FACTOR = 1
+# with a seed the load is checkpointed: run again after a failure and it skips every batch that was committed
+SEED = None
 
 filling_order = (
     "customers",
@@ -36,5 +31,17 @@ filling_order = (
     "work_orders"
 )
 
-for table in filling_order:
-    result = orm.fill_table(table=table, fillings=100)
\ No newline at end of file
+if __name__ == "__main__":
+    orm = PostgresORM(
+        host=HOST,
+        port=PORT,
+        username=USERNAME,
+        password=PASSWORD,
+        db_name=DB_NAME,
+        schema_name=SCHEMA_NAME,
+        seed=SEED,
+        checkpoint=SEED is not None
+    )
+
+    # tables without foreign keys between them are filled at the same time, each in its own process, seats in the one of bookings
+    results = orm.fill_tables(tables=filling_order, scale_factor=SCALE_FACTOR)
@@ -1,12 +1,70 @@
+import os
 import psycopg2
-from datetime import timedelta
-from faker import Faker
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import partial
+from threading import Lock
 import psycopg2._psycopg
-
-from random import random
+import psycopg2.pool
+
+import numpy as np
+
+from postgres_orm.bulk import build_copy_buffer, chunked, encode_copy_rows, prefetch
+from postgres_orm.cache import TableCache
+from postgres_orm.checkpoint import COMPLETE_BATCH, FillCheckpoint
+from postgres_orm.columnar import ColumnBuilder
+from postgres_orm.dataset import DatasetWriter, load_dataset
+from postgres_orm.export import DEFAULT_COMPRESSIONS, EXPORT_FORMATS, arrow_columns, copy_to_csv, copy_to_parquet, export_path
+from postgres_orm.generators import BatchGenerator
+from postgres_orm.instrumentation import Instrumentation, InstrumentedConnection, InstrumentedCursor
+from postgres_orm.intervals import IntervalIndex
+from postgres_orm.inventory import SeatInventory
+from postgres_orm.queries import (
+    COUNT_SEATS, FLIGHT_CHUNK, FLIGHT_RANGES, FOREIGN_KEYS, JOURNAL_FOREIGN_KEYS, OCCUPANCY, OCCUPY_SEATS, RANGE_HAS_SEATS, RANGE_SEATS,
+    RECONCILE_OCCUPANCY, UNSEATED_FLIGHTS, build_query
+)
+from postgres_orm.registry import KeyRegistry
+from postgres_orm.rows import (
+    AIRPORT_CODES, FLIGHT_NUMBERS, TABLE_COLUMNS, WINDOW_COLUMNS, aircraft_rows, aircraft_slot_rows, airline_rows, airport_rows, book_chunk,
+    booking_groups, customer_rows, flight_data_rows, flight_rows, flight_schedule_rows, lookup_rows, maintenance_event_rows, reporteur_rows,
+    seat_map, work_order_rows
+)
+from postgres_orm.schedule import DAILY, AircraftRotation, add_months
+from postgres_orm.scale import scale_fillings
+from postgres_orm.schema import BULK_LOAD_JOURNAL, FILL_PROGRESS, SCHEMA_SNAPSHOTS, SchemaSnapshot, schema_query
+from postgres_orm.scheduler import build_dependency_graph, order_dependency_graph, run_dependency_graph
+
+LOAD_METHODS = ("insert", "copy")
+COMMIT_POLICIES = ("row", "batch", "table")
+SEAT_COLUMNS = TABLE_COLUMNS["seats"]
+# no filler samples keys of these tables, so their keys are never loaded or kept
+UNSAMPLED_TABLES = ("seats", "bookings", "work_orders", "aircraft_slots")
+# the seats fill skips flights that have seats, it is resumed by running it again and needs no checkpoint
+UNCHECKPOINTED_TABLES = ("seats",)
+# deferred seats are only known to the process that deferred them, so the bookings fill that writes them runs in the same worker
+JOINED_FILLS = {"seats": "bookings"}
 
 class PostgresORM:
-    def __init__(self, host: str, port: str, username: str, password: str, db_name: str, schema_name: str):
+    def __init__(self, host: str, port: str, username: str, password: str, db_name: str, schema_name: str, load_method: str = "insert", commit_policy: str = "batch", batch_size: int = 10_000, workers: int = 1, pool_size: int = 8, cursor_factory: type = None, instrumentation: Instrumentation = None, cache_entries: int = 128, cache_rows: int = 100_000, pipeline_depth: int = 0, seed: int = None, checkpoint: bool = False):
+        if load_method not in LOAD_METHODS:
+            raise ValueError(f'Unknown load method {load_method}, expected one of {LOAD_METHODS}')
+        if commit_policy not in COMMIT_POLICIES:
+            raise ValueError(f'Unknown commit policy {commit_policy}, expected one of {COMMIT_POLICIES}')
+        if batch_size < 1:
+            raise ValueError('batch_size must be positive')
+        if not 1 <= workers <= pool_size:
+            raise ValueError(f'workers must be between 1 and pool_size ({pool_size})')
+        if pipeline_depth < 0:
+            raise ValueError('pipeline_depth can not be negative')
+        if instrumentation is not None and cursor_factory is not None:
+            raise ValueError('cursor_factory can not be combined with instrumentation')
+        if checkpoint and seed is None:
+            raise ValueError('checkpoint needs a seed, resumed batches have to be generated the same way again')
+        if checkpoint and commit_policy == "row":
+            raise ValueError('checkpoints are kept per batch, they can not be combined with the row commit policy')
+
         self.host = host
         self.port = port
         self.username = username
@@ -14,19 +72,109 @@ class PostgresORM:
         self.db_name = db_name
 
         self.schema_name = schema_name
-
-        self.connection = self.get_connection()
-        if self.connection is None:
-            raise ConnectionError(f'Can not connect to {self.db_name}')
-    
-        self.cursor = self.get_cursor()
-        
-        self.faker = Faker()
-
-        self.filling_mapper = {
-            table: getattr(self, f'_PostgresORM__fill_{table}')
-            for table in self.get_tables()
-        }
+        self.cursor_factory = cursor_factory
+        self.instrumentation = instrumentation
+        self.connection_factory = None
+        if instrumentation is not None:
+            # every connection of this ORM, pooled ones included, reports to the same instrumentation
+            self.connection_factory = type("InstrumentedConnection", (InstrumentedConnection,), {"instrumentation": instrumentation})
+
+        # the connection, the schema and faker are only set up by the first call that needs them
+        self.__connection = None
+        self.__cursor = None
+        self.__schema = None
+        self.__filling_mapper = None
+
+        # with a seed every fill generates its batches by index, with checkpoint it also skips the batches it committed before
+        self.seed = seed
+        self.checkpoint = checkpoint
+        self.fill_checkpoint = None
+        self.generator = BatchGenerator(seed=seed)
+
+        self.load_method = load_method
+        self.commit_policy = commit_policy
+        self.batch_size = batch_size
+        self.workers = workers
+        self.pool_size = pool_size
+        # batches generated ahead of the writer, 0 generates each batch only when the previous one is written
+        self.pipeline_depth = pipeline_depth
+        self.pool = None
+        self.write_lock = Lock()
+
+        self.key_registry = KeyRegistry()
+        # seat numbers and classes of a flight, read once from seat_classes
+        self.seat_layout = None
+        # fills that run bookings after seats defer the seats, so they are written once with their final status
+        self.defer_seats = False
+        # set by a deferred seats fill, the next bookings fill or flush writes seats for every flight that has none
+        self.seats_pending = False
+        self.interval_indexes = {}
+        self.dataset = None
+        # reads of other sessions' writes only show up after invalidate_cache
+        self.cache = TableCache(cache_entries, cache_rows)
+        self.stream_count = 0
+        self.committed_rows = {}
+        self.commit_count = 0
+
+    @property
+    def connection(self) -> psycopg2._psycopg.connection:
+        if self.__connection is None:
+            connection = self.get_connection()
+            if connection is None:
+                raise ConnectionError(f'Can not connect to {self.db_name}')
+
+            self.__connection = connection
+
+        return self.__connection
+
+    @property
+    def cursor(self) -> psycopg2._psycopg.cursor:
+        if self.__cursor is None:
+            self.__cursor = self.get_cursor()
+
+        return self.__cursor
+
+    @property
+    def faker(self):
+        return self.generator.faker
+
+    @property
+    def schema(self) -> SchemaSnapshot:
+        if self.__schema is None:
+            key = (self.host, self.port, self.db_name, self.schema_name)
+            if key not in SCHEMA_SNAPSHOTS:
+                self.cursor.execute(schema_query("%s"), (self.schema_name,))
+                SCHEMA_SNAPSHOTS[key] = SchemaSnapshot(self.cursor.fetchall())
+
+            self.__schema = SCHEMA_SNAPSHOTS[key]
+
+        return self.__schema
+
+    def refresh_schema(self) -> SchemaSnapshot:
+        # the snapshot is shared by the process, tables created or altered after it was taken need a refresh
+        SCHEMA_SNAPSHOTS.pop((self.host, self.port, self.db_name, self.schema_name), None)
+        self.__schema = None
+        self.__filling_mapper = None
+
+        return self.schema
+
+    @property
+    def filling_mapper(self) -> dict:
+        if self.__filling_mapper is None:
+            self.__filling_mapper = {
+                table: getattr(self, f'_PostgresORM__fill_{table}')
+                for table in self.schema.tables
+            }
+
+        return self.__filling_mapper
+
+    @property
+    def primary_keys(self) -> dict[str, str]:
+        return self.schema.primary_keys
+
+    @property
+    def column_types(self) -> dict[str, dict[str, str]]:
+        return self.schema.column_types
 
     def get_connection(self) -> psycopg2._psycopg.connection:
         try:
@@ -35,7 +183,9 @@ class PostgresORM:
                 user=self.username,
                 password=self.password,
                 host=self.host,
-                port=self.port
+                port=self.port,
+                connection_factory=self.connection_factory,
+                cursor_factory=InstrumentedCursor if self.instrumentation is not None else self.cursor_factory
             )
             print(f'Successfully connected to {self.db_name}')
             return connection
@@ -43,6 +193,43 @@ class PostgresORM:
             print(e)
             return None
 
+    def get_pool(self) -> psycopg2.pool.ThreadedConnectionPool:
+        if self.pool is None:
+            self.pool = psycopg2.pool.ThreadedConnectionPool(
+                1,
+                self.pool_size,
+                dbname=self.db_name,
+                user=self.username,
+                password=self.password,
+                host=self.host,
+                port=self.port,
+                connection_factory=self.connection_factory,
+                cursor_factory=InstrumentedCursor if self.instrumentation is not None else self.cursor_factory
+            )
+
+        return self.pool
+
+    def close(self) -> None:
+        flushed = self.flush_seats()
+
+        if self.pool is not None:
+            self.pool.closeall()
+            self.pool = None
+
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
+            self.__cursor = None
+
+        if not flushed:
+            raise RuntimeError("Deferred seats failed to write, they are lost with the connection")
+
+    def __enter__(self) -> "PostgresORM":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
     def get_cursor(self) -> psycopg2._psycopg.cursor:
         if self.connection:
             return self.connection.cursor()
@@ -52,522 +239,1433 @@ class PostgresORM:
     def get_tables(self) -> list[str]:
         try:
             self.cursor.execute(f"""SELECT table_name FROM information_schema.tables 
-                               WHERE table_schema = '{self.schema_name}'""")
+                               WHERE table_schema = '{self.schema_name}' AND table_name NOT IN ('{BULK_LOAD_JOURNAL}', '{FILL_PROGRESS}')""")
             
             return [table[0] for table in self.cursor.fetchall()]
         except Exception as e:
             print(f'Can not get tables from {self.db_name}')
 
+    def get_foreign_keys(self) -> dict[str, set[str]]:
+        self.cursor.execute(build_query(FOREIGN_KEYS, self.schema_name, "%s"), (self.schema_name,))
+
+        references = self.cursor.fetchall()
+        if self.__has_bulk_load_journal():
+            self.cursor.execute(build_query(JOURNAL_FOREIGN_KEYS, self.schema_name))
+            references += self.cursor.fetchall()
+
+        foreign_keys = {}
+        for table, reference in references:
+            foreign_keys.setdefault(table, set()).add(reference)
+
+        return foreign_keys
+
+    def __has_bulk_load_journal(self) -> bool:
+        self.cursor.execute("SELECT to_regclass(%s)", (f'{self.schema_name}.{BULK_LOAD_JOURNAL}',))
+
+        return self.cursor.fetchone()[0] is not None
+
+    def get_connection_params(self) -> dict:
+        return {
+            "host": self.host,
+            "port": self.port,
+            "username": self.username,
+            "password": self.password,
+            "db_name": self.db_name,
+            "schema_name": self.schema_name,
+            "load_method": self.load_method,
+            "commit_policy": self.commit_policy,
+            "batch_size": self.batch_size,
+            "workers": self.workers,
+            "pool_size": self.pool_size,
+            "cursor_factory": self.cursor_factory,
+            "cache_entries": self.cache.max_entries,
+            "cache_rows": self.cache.max_rows,
+            "pipeline_depth": self.pipeline_depth,
+            "seed": self.seed,
+            "checkpoint": self.checkpoint
+        }
+
+    def __reserve_ids(self, cursor, table: str, count: int) -> list[int]:
+        if self.dataset is not None:
+            return self.dataset.reserve_ids(table, count)
+
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            (f'{self.schema_name}.{table}', self.primary_keys[table], count)
+        )
+
+        return [result[0] for result in cursor.fetchall()]
+
+    def __insert_rows(self, cursor, table: str, columns: tuple[str], rows: list[tuple]) -> list:
+        primary_key = self.primary_keys[table]
+        query = f'INSERT INTO {self.schema_name}.{table} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))}) RETURNING {primary_key}'
+        keys = []
+
+        for row in rows:
+            cursor.execute(query, row)
+            keys.append(cursor.fetchone()[0])
+
+        return keys
+
+    def __copy_rows(self, cursor, table: str, columns: tuple[str], rows: list[tuple], lines: list[str] = None) -> list:
+        primary_key = self.primary_keys[table]
+
+        if primary_key in columns:
+            keys = [row[columns.index(primary_key)] for row in rows]
+            buffer = build_copy_buffer(rows, lines)
+        else:
+            keys = self.__reserve_ids(cursor, table, len(rows))
+            columns = (*columns, primary_key)
+            buffer = build_copy_buffer(rows, lines, keys)
+
+        cursor.copy_expert(f'COPY {self.schema_name}.{table} ({", ".join(columns)}) FROM STDIN', buffer)
+
+        return keys
+
+    def invalidate_cache(self, table: str = None) -> None:
+        if table is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate(table)
+
+    def __commit(self, connection, rows: dict[str, int]) -> None:
+        connection.commit()
+        for table in rows:
+            self.cache.invalidate(table)
+
+        with self.write_lock:
+            self.commit_count += 1
+            for table, count in rows.items():
+                self.committed_rows[table] = self.committed_rows.get(table, 0) + count
+
+    def __load_keys(self, table: str) -> None:
+        primary_key = self.primary_keys[table]
+        integer_keys = self.column_types[table][primary_key] == "integer"
+
+        self.key_registry.add(table, [], integer_keys=integer_keys)
+        if self.dataset is not None:
+            # a materialized dataset only references its own rows
+            return
+
+        # seeded fills sample keys by position, so the positions must not depend on the physical order of the rows
+        order_by = primary_key if self.seed is not None else None
+        for results in self.iter_table_content(table, columns=[primary_key], as_dicts=False, itersize=self.batch_size, order_by=order_by):
+            self.key_registry.add(table, [result[0] for result in results], integer_keys=integer_keys)
+
+    def __table_keys(self, table: str) -> np.ndarray:
+        if table not in self.key_registry:
+            self.__load_keys(table)
+
+        return self.key_registry.get(table)
+
+    def __sample_keys(self, table: str, size: int, generator: BatchGenerator = None):
+        if table not in self.key_registry:
+            self.__load_keys(table)
+
+        return self.key_registry.sample(table, size, (generator or self.generator).rng)
+
+    def __register_keys(self, table: str, batches: list[tuple[list, list[tuple]]]) -> None:
+        for keys, _ in batches:
+            self.key_registry.add(table, keys)
+
+    def __dump_rows(self, table: str, columns: tuple[str], rows) -> int:
+        primary_key = self.primary_keys[table]
+        register = table not in UNSAMPLED_TABLES
+        if register and table not in self.key_registry:
+            self.__load_keys(table)
+
+        written = 0
+
+        for batch in chunked(rows, self.batch_size):
+            if primary_key in columns:
+                keys = [row[columns.index(primary_key)] for row in batch]
+                self.dataset.write(table, columns, batch)
+            else:
+                keys = self.__reserve_ids(None, table, len(batch))
+                self.dataset.write(table, (primary_key, *columns), [(key, *row) for key, row in zip(keys, batch)])
+
+            if register:
+                self.__register_keys(table, [(keys, batch)])
+            written += len(batch)
+
+        return written
+
+    def __write_rows(self, table: str, columns: tuple[str], rows, connection: psycopg2._psycopg.connection = None) -> int:
+        if self.dataset is not None:
+            written = self.__dump_rows(table, columns, rows)
+            print(f'Wrote {written} rows of {table} to {self.dataset.directory}')
+
+            return written
+
+        # uncommitted rows are visible to reads on this connection, so the cache drops the table up front too
+        self.cache.invalidate(table)
+        batch_size = 1 if self.commit_policy == "row" else self.batch_size
+
+        connection = connection or self.connection
+        cursor = self.cursor if connection is self.connection else connection.cursor()
+
+        register = table not in UNSAMPLED_TABLES
+        if register and table not in self.key_registry:
+            self.__load_keys(table)
+
+        checkpoint = self.fill_checkpoint if self.fill_checkpoint is not None and self.fill_checkpoint.table == table else None
+
+        written = 0
+        pending = []
+        pending_indexes = []
+        failed_rows = 0
+
+        if self.pipeline_depth:
+            # the producer thread also encodes COPY text, so that work overlaps with the writes too
+            encode = encode_copy_rows if self.load_method == "copy" else lambda batch: None
+            batches = prefetch(((batch, encode(batch)) for batch in chunked(rows, batch_size)), self.pipeline_depth)
+        else:
+            batches = ((batch, None) for batch in chunked(rows, batch_size))
+
+        # only batches sharing the transaction of the table need a savepoint, any other batch is a transaction of its own
+        savepoints = self.commit_policy == "table"
+
+        try:
+            for batch, lines in batches:
+                batch_index = checkpoint.next_batch() if checkpoint is not None else None
+
+                if savepoints:
+                    cursor.execute("SAVEPOINT fill_batch")
+                try:
+                    batch_keys = self.__write_batch(cursor, table, columns, batch, lines, checkpoint, batch_index)
+                except psycopg2.Error as e:
+                    if savepoints:
+                        cursor.execute("ROLLBACK TO SAVEPOINT fill_batch")
+                    else:
+                        connection.rollback()
+                    failed_rows += len(batch)
+                    print(f'Rolled back batch of {len(batch)} rows in {table}: {e}')
+
+                    continue
+
+                if savepoints:
+                    cursor.execute("RELEASE SAVEPOINT fill_batch")
+                pending.append((batch_keys, batch))
+                pending_indexes.append(batch_index)
+
+                if self.commit_policy != "table":
+                    self.__commit(connection, {table: len(batch_keys)})
+                    if register:
+                        self.__register_keys(table, pending)
+                    if checkpoint is not None:
+                        checkpoint.commit(batch_index, len(batch))
+                    written += len(batch_keys)
+                    pending, pending_indexes = [], []
+
+            if pending or self.commit_policy == "table":
+                self.__commit(connection, {table: sum(len(batch_keys) for batch_keys, _ in pending)})
+                if register:
+                    self.__register_keys(table, pending)
+                if checkpoint is not None:
+                    for batch_index, (_, batch) in zip(pending_indexes, pending):
+                        checkpoint.commit(batch_index, len(batch))
+                written += sum(len(batch_keys) for batch_keys, _ in pending)
+        except Exception:
+            connection.rollback()
+
+            raise
+        finally:
+            batches.close()
+            if cursor is not self.cursor:
+                cursor.close()
+
+        print(f'Committed {written} rows into {table}')
+
+        if failed_rows:
+            raise RuntimeError(f'{failed_rows} rows of {table} were rolled back')
+
+        return written
+
+    def __write_batch(self, cursor, table: str, columns: tuple[str], batch: list[tuple], lines: list[str] = None, checkpoint: FillCheckpoint = None, batch_index: int = None) -> list:
+        if lines is not None or self.load_method == "copy":
+            batch_keys = self.__copy_rows(cursor, table, columns, batch, lines)
+        else:
+            batch_keys = self.__insert_rows(cursor, table, columns, batch)
+
+        if table == "seats":
+            self.__count_seats(cursor, batch)
+        if checkpoint is not None:
+            # the progress row commits with the batch, so a batch is either in both or in neither
+            self.__record_batch(cursor, checkpoint, batch_index, len(batch))
+
+        return batch_keys
+
+    def __count_seats(self, cursor, rows: list[tuple]) -> None:
+        deltas = {}
+        for _, _, seat_status, flight_id in rows:
+            delta = deltas.setdefault(flight_id, [0, 0])
+            delta[0 if seat_status == "Occupied" else 1] += 1
+
+        cursor.execute(
+            build_query(COUNT_SEATS, self.schema_name, "%s", "%s", "%s"),
+            (list(deltas), [passengers for passengers, _ in deltas.values()], [available for _, available in deltas.values()])
+        )
+        self.cache.invalidate("flight_data")
+
+    def get_occupancy(self, flight_ids: list[int]) -> dict[int, tuple[int, int]]:
+        self.cursor.execute(build_query(OCCUPANCY, self.schema_name, "%s"), (list(flight_ids),))
+
+        return {flight_id: (passengers, available) for flight_id, passengers, available in self.cursor.fetchall()}
+
+    def reconcile_occupancy(self) -> int:
+        self.cursor.execute(build_query(RECONCILE_OCCUPANCY, self.schema_name))
+        corrected = self.cursor.rowcount
+        self.connection.commit()
+        self.cache.invalidate("flight_data")
+
+        print(f'Reconciled the occupancy of {corrected} flights')
+
+        return corrected
+
+    def __run_partitions(self, partitions: list) -> list:
+        if len(partitions) <= 1:
+            return [partition(self.connection, self.generator) for partition in partitions]
+
+        pool = self.get_pool()
+
+        def run(partition, generator: BatchGenerator):
+            connection = pool.getconn()
+            try:
+                return partition(connection, generator)
+            finally:
+                pool.putconn(connection)
+
+        with ThreadPoolExecutor(max_workers=len(partitions)) as executor:
+            futures = [executor.submit(run, partition, self.generator.spawn()) for partition in partitions]
+
+            return [future.result() for future in futures]
+
+    def __seat_layout(self) -> tuple[list[str], list[str]]:
+        if self.dataset is not None:
+            seat_classes = seat_map()
+        elif self.seat_layout is None:
+            self.cursor.execute(f"SELECT seat_number, seat_class FROM {self.schema_name}.seat_classes")
+            seat_classes = self.cursor.fetchall()
+            self.connection.commit()
+        else:
+            return self.seat_layout
+
+        layout = ([seat_number for seat_number, _ in seat_classes], [seat_class for _, seat_class in seat_classes])
+        if self.dataset is None:
+            self.seat_layout = layout
+
+        return layout
+
+    def __held_rows(self, connection, query: str, params: tuple, itersize: int):
+        with self.write_lock:
+            self.stream_count += 1
+            cursor = connection.cursor(name=f'held_stream_{self.stream_count}', withhold=True)
+
+        try:
+            cursor.execute(query, params)
+            # committed right away, so the cursor outlives the commits and rollbacks of the writes on its connection
+            connection.commit()
+
+            while rows := cursor.fetchmany(itersize):
+                yield from rows
+        finally:
+            cursor.close()
+
+    def __flight_ranges(self) -> list[tuple[int, int, int]]:
+        if self.dataset is not None:
+            flight_ids = np.sort(self.__table_keys("flight_data"))
+
+            return [(int(flight_range[0]), int(flight_range[-1]), len(flight_range)) for flight_range in np.array_split(flight_ids, self.workers) if len(flight_range)]
+
+        self.cursor.execute(build_query(FLIGHT_RANGES, self.schema_name, "%s"), (self.workers,))
+        flight_ranges = self.cursor.fetchall()
+        self.connection.commit()
+
+        return flight_ranges
+
+    def __flight_chunks(self, cursor, low: int, high: int, chunk_flights: int):
+        if self.dataset is not None:
+            flight_ids = np.sort(self.__table_keys("flight_data"))
+            yield from chunked(flight_ids[(flight_ids >= low) & (flight_ids <= high)].tolist(), chunk_flights)
+
+            return
+
+        last = low - 1
+        while True:
+            cursor.execute(build_query(FLIGHT_CHUNK, self.schema_name, "%s", "%s", "%s"), (last, high, chunk_flights))
+            chunk = [flight_id for flight_id, in cursor.fetchall()]
+            if not chunk:
+                return
+
+            last = chunk[-1]
+            yield chunk
+
+    def __seat_inventories(self, connection, low: int, high: int, chunk_flights: int):
+        # one inventory per chunk of flights, only the seats of that chunk are ever held
+        seat_numbers, seat_classes = self.__seat_layout()
+        cursor = connection.cursor() if self.dataset is None else None
+        seats = None
+
+        try:
+            if self.dataset is None:
+                cursor.execute(build_query(RANGE_HAS_SEATS, self.schema_name, "%s", "%s"), (low, high))
+                if cursor.fetchone()[0]:
+                    seats = self.__held_rows(
+                        connection,
+                        build_query(RANGE_SEATS, self.schema_name, "%s", "%s"),
+                        (low, high),
+                        self.batch_size
+                    )
+
+            seat = next(seats, None) if seats is not None else None
+            for chunk in self.__flight_chunks(cursor, low, high, chunk_flights):
+                inventory = SeatInventory(seat_numbers, seat_classes)
+                while seat is not None and seat[0] <= chunk[-1]:
+                    inventory.load_seat(*seat)
+                    seat = next(seats, None)
+                inventory.compact()
+
+                missing = [flight_id for flight_id in chunk if flight_id not in inventory]
+                if missing and self.seats_pending:
+                    inventory.stage_flights(missing, self.__reserve_ids(cursor, "seats", len(missing) * inventory.seats_per_flight))
+
+                yield chunk, inventory
+        finally:
+            if seats is not None:
+                seats.close()
+            if cursor is not None:
+                cursor.close()
+
+    def get_interval_index(self, table: str) -> IntervalIndex:
+        if table not in self.interval_indexes:
+            index = IntervalIndex()
+            if self.dataset is None:
+                aircraft, start, end = WINDOW_COLUMNS[table]
+                for rows in self.iter_table_content(
+                    table,
+                    columns=[aircraft, f"EXTRACT(EPOCH FROM {start})::bigint", f"EXTRACT(EPOCH FROM {end})::bigint"],
+                    as_dicts=False,
+                    itersize=self.batch_size
+                ):
+                    index.add(*[np.array(column, dtype=np.int64) for column in zip(*rows)])
+
+            # later fills of this ORM add their windows, windows other sessions write only show up in a new index
+            self.interval_indexes[table] = index
+
+        return self.interval_indexes[table]
+
+    def find_free_window(self, table: str, aircraft_registration_number: int, after: datetime, duration: timedelta) -> datetime:
+        start = self.get_interval_index(table).find_free(
+            aircraft_registration_number,
+            int(np.datetime64(after, "s").astype(np.int64)),
+            -(-duration // timedelta(seconds=1))
+        )
+
+        return np.datetime64(start, "s").astype(datetime)
+
+    def is_aircraft_free(self, table: str, aircraft_registration_number: int, start: datetime, end: datetime) -> bool:
+        return not self.get_interval_index(table).overlaps(
+            aircraft_registration_number,
+            int(np.datetime64(start, "s").astype(np.int64)),
+            int(np.datetime64(end, "s").astype(np.int64))
+        )
+
+    def flush_seats(self) -> bool:
+        # flights the seats fill deferred and no bookings fill reached get their seats as 'Available'
+        if not self.seats_pending:
+            return True
+
+        try:
+            self.__book_flights(0)
+        except Exception as e:
+            print(f"Failed to write deferred seats: {e}")
+
+            return False
+
+        return True
+
     def get_table_ids(self, table: str, column: str) -> list[int]:
-        query = f"SELECT {column} FROM {self.schema_name}.{table}"
-        
-        self.cursor.execute(query)
-        
-        results = self.cursor.fetchall()
+        if table == "seats" and not self.flush_seats():
+            raise RuntimeError("Can not read seats while deferred seats fail to write")
+
+        start = time.perf_counter() if self.instrumentation is not None else None
+
+        ids = self.cache.get(table, column)
+        if ids is None:
+            query = f"SELECT {column} FROM {self.schema_name}.{table}"
+            
+            self.cursor.execute(query)
+            
+            ids = tuple(result[0] for result in self.cursor.fetchall())
+            self.cache.put(table, column, ids, len(ids))
         
-        return [result[0] for result in results]
+        if self.instrumentation is not None:
+            self.instrumentation.record("get_table_ids", time.perf_counter() - start, table=table, ids_read=len(ids))
+
+        return list(ids)
 
     def get_table_content(self, table: str) -> list[dict]:
         try:
-            self.cursor.execute(f"SELECT * FROM {self.schema_name}.{table}")
+            if table == "seats" and not self.flush_seats():
+                raise RuntimeError("deferred seats fail to write")
+
+            content = self.cache.get(table, "*")
+            if content is None:
+                self.cursor.execute(f"SELECT * FROM {self.schema_name}.{table}")
 
-            columns = [desc[0] for desc in self.cursor.description]
+                content = ([desc[0] for desc in self.cursor.description], self.cursor.fetchall())
+                self.cache.put(table, "*", content, len(content[1]))
 
-            return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+            columns, rows = content
+
+            # fresh dicts on every call, callers may change them without touching the cache
+            return [dict(zip(columns, row)) for row in rows]
         except Exception as e:
             print(f"Error retrieving data from {table}. Error - {e}")
             return []
+
+    def iter_table_content(self, table: str, columns: list[str] = None, where: str = None, params: tuple = None, itersize: int = 10_000, as_dicts: bool = True, order_by: str = None):
+        query = f'SELECT {", ".join(columns) if columns else "*"} FROM {self.schema_name}.{table}'
+        if where:
+            query += f' WHERE {where}'
+        if order_by:
+            query += f' ORDER BY {order_by}'
+        if table == "seats" and not self.flush_seats():
+            raise RuntimeError("Can not read seats while deferred seats fail to write")
+
+        self.stream_count += 1
+        # named cursor: rows stay on the server and arrive itersize at a time
+        cursor = self.connection.cursor(name=f'{table}_stream_{self.stream_count}')
+        cursor.itersize = itersize
+
+        try:
+            cursor.execute(query, params)
+
+            names = None
+            while True:
+                rows = cursor.fetchmany(itersize)
+                if not rows:
+                    break
+
+                if not as_dicts:
+                    yield rows
+
+                    continue
+
+                if names is None:
+                    names = [desc[0] for desc in cursor.description]
+
+                yield [dict(zip(names, row)) for row in rows]
+        finally:
+            cursor.close()
+
+    def get_table_columns(self, table: str, columns: list[str] = None, where: str = None, params: tuple = None, itersize: int = 100_000) -> dict:
+        column_types = self.column_types[table]
+        builders = [ColumnBuilder(column, column_types[column]) for column in columns or column_types]
+
+        for rows in self.iter_table_content(
+            table,
+            columns=[builder.select_expression() for builder in builders],
+            where=where,
+            params=params,
+            itersize=itersize,
+            as_dicts=False
+        ):
+            for builder, values in zip(builders, zip(*rows)):
+                builder.append(values)
+
+        return {builder.name: builder.build() for builder in builders}
+
+    def __numeric_precisions(self, cursor, table: str) -> dict[str, tuple[int, int]]:
+        cursor.execute(
+            "SELECT column_name, numeric_precision, numeric_scale FROM information_schema.columns WHERE table_schema = %s AND table_name = %s AND data_type = 'numeric'",
+            (self.schema_name, table)
+        )
+
+        return {column: (precision, scale) for column, precision, scale in cursor.fetchall()}
+
+    def export_table(self, table: str, path: str, file_format: str = "csv", columns: list[str] = None, where: str = None, params: tuple = None, compression: str = None, row_group_size: int = 1_000_000, connection: psycopg2._psycopg.connection = None) -> int:
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f'Unknown export format {file_format}, expected one of {tuple(EXPORT_FORMATS)}')
+        if connection is None and not self.flush_seats():
+            raise RuntimeError("Can not export while deferred seats fail to write")
+
+        connection = connection or self.connection
+        column_types = {column: self.column_types[table][column] for column in columns or self.column_types[table]}
+        compression = compression or DEFAULT_COMPRESSIONS[file_format]
+        # written beside path and renamed once complete, a failed export leaves whatever was at path alone
+        partial_path = f'{path}.partial'
+
+        cursor = connection.cursor()
+        try:
+            if file_format == "csv":
+                expressions = list(column_types)
+            else:
+                expressions, schema = arrow_columns(column_types, self.__numeric_precisions(cursor, table))
+
+            # COPY takes no parameters, they are bound into the query on the client
+            query = f'SELECT {", ".join(expressions)} FROM {self.schema_name}.{table}'
+            if where:
+                query += f' WHERE {cursor.mogrify(where, params).decode() if params else where}'
+
+            if file_format == "csv":
+                rows = copy_to_csv(cursor, query, partial_path, compression)
+            else:
+                rows = copy_to_parquet(cursor, query, partial_path, schema, row_group_size, compression)
+
+            connection.commit()
+            os.replace(partial_path, path)
+        except Exception:
+            connection.rollback()
+            # a half written file must not pass for an export
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+            raise
+        finally:
+            cursor.close()
+
+        print(f'Exported {rows} rows of {table} to {path}')
+
+        return rows
+
+    def export_tables(self, directory: str, tables: list[str] = None, file_format: str = "csv", compression: str = None, row_group_size: int = 1_000_000, workers: int = None) -> dict[str, int]:
+        tables = list(self.filling_mapper) if tables is None else tables
+        workers = workers or self.workers
+        if not 1 <= workers <= self.pool_size:
+            raise ValueError(f'workers must be between 1 and pool_size ({self.pool_size})')
+        if not self.flush_seats():
+            raise RuntimeError("Can not export while deferred seats fail to write")
+
+        os.makedirs(directory, exist_ok=True)
+
+        def export(table: str) -> int:
+            path = export_path(directory, table, file_format, compression)
+            if workers == 1:
+                return self.export_table(table, path, file_format, compression=compression, row_group_size=row_group_size, connection=self.connection)
+
+            pool = self.get_pool()
+            connection = pool.getconn()
+            try:
+                return self.export_table(table, path, file_format, compression=compression, row_group_size=row_group_size, connection=connection)
+            finally:
+                pool.putconn(connection)
+
+        # largest tables first, so the longest export is never the one started last
+        self.cursor.execute(
+            """SELECT c.relname, pg_table_size(c.oid) FROM pg_class c
+               JOIN pg_namespace n ON n.oid = c.relnamespace
+               WHERE n.nspname = %s AND c.relname = ANY(%s)""",
+            (self.schema_name, list(tables))
+        )
+        sizes = dict(self.cursor.fetchall())
+        self.connection.commit()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {table: executor.submit(export, table) for table in sorted(tables, key=lambda table: sizes.get(table, 0), reverse=True)}
+
+            return {table: futures[table].result() for table in tables}
             
     def __fill_airlines(self, fillings: int) -> bool:
         try:
-            for _ in range(fillings):
-                airline_name = f'{self.faker.company()} Air'
-                self.cursor.execute(
-                    f'INSERT INTO {self.schema_name}.airlines (airline_name) VALUES (%s)',
-                    (airline_name,)
-                )
-                self.connection.commit()
-        except Exception as e: 
+            self.__write_rows("airlines", TABLE_COLUMNS["airlines"], airline_rows(self.generator, fillings, self.batch_size))
+        except Exception as e:
             print(e)
 
             return False
-    
+
         return True
-    
-    def occupy_seats(self, seat_ids: list[int]) -> None:
+
+    def __occupy(self, cursor, seat_ids: list[int]) -> None:
+        cursor.execute(build_query(OCCUPY_SEATS, self.schema_name, "%s"), (seat_ids,))
+
+    def occupy_seats(self, seat_ids: list[int], connection: psycopg2._psycopg.connection = None) -> bool:
+        connection = connection or self.connection
         try:
-            query = f"UPDATE {self.schema_name}.seats SET seat_status = 'Occupied' WHERE seat_id = ANY(%s)"
-            
-            self.cursor.execute(query, (seat_ids,))
-            
-            self.connection.commit()
+            self.cache.invalidate("seats")
+            with connection.cursor() as cursor:
+                self.__occupy(cursor, seat_ids)
+
+            connection.commit()
+            self.cache.invalidate("seats")
+            self.cache.invalidate("flight_data")
 
             print(f"Successfully updated {len(seat_ids)} seats to 'Occupied' status.")
         except Exception as e:
+            connection.rollback()
             print(f"Failed to update seat status: {e}")
 
             return False
-        
+
         return True
-    
+
     def __fill_seat_classes(self, fillings: int) -> bool:
         try:
-            rows = range(1, 41)
-            seat_letters = ["A", "B", "C", "D", "E", "F"]
-
-            for row in rows:
-                for letter in seat_letters:
-                    seat_number = f"{row}{letter}"
-                    seat_class =  "Business" if row <= 3 else "First Class" if row <= 6 else "Economy"
-
-                    self.cursor.execute(
-                            f"INSERT INTO {self.schema_name}.seat_classes (seat_number, seat_class) VALUES (%s, %s)",
-                            (seat_number, seat_class)
-                        )
-                    
-                    self.connection.commit()
+            self.__write_rows("seat_classes", TABLE_COLUMNS["seat_classes"], lookup_rows("seat_classes"))
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
+
         return True
 
-    
+
+    def __unseated_flights(self) -> int:
+        if self.dataset is not None:
+            return len(self.__table_keys("flight_data"))
+
+        self.cursor.execute(build_query(UNSEATED_FLIGHTS, self.schema_name))
+        flights = self.cursor.fetchone()[0]
+        self.connection.commit()
+
+        return flights
+
     def __fill_seats(self, fillings: int) -> bool:
         try:
-            flight_ids = self.get_table_ids("flight_data", "flight_id")
-            seat_numbers = self.get_table_ids("seat_classes", "seat_number")
+            if not self.__seat_layout()[0]:
+                raise LookupError("No seat classes, seat_classes has to be filled first")
 
-            for flight_id in flight_ids:
-                for seat_number in seat_numbers:
-                    seat_status = "Available"
+            self.seats_pending = True
+            if self.defer_seats:
+                # the bookings fill of the same run writes them, with the status they end up in
+                print(f"Deferred the seats of {self.__unseated_flights()} flights to the bookings fill")
 
-                    self.cursor.execute(
-                        f"INSERT INTO {self.schema_name}.seats (seat_number, seat_status, flight_id) VALUES (%s, %s, %s)",
-                        (seat_number, seat_status, flight_id)
-                    )
+                return True
+
+            try:
+                seats, _ = self.__book_flights(0)
+            finally:
+                # a failed fill is resumed by filling seats again, close does not retry it behind the caller's back
+                self.seats_pending = False
 
-                    self.connection.commit()
+            print(f'Committed {seats} rows into seats' if self.dataset is None else f'Wrote {seats} rows of seats to {self.dataset.directory}')
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
+
         return True
-        
+
     def __fill_customers(self, fillings: int) -> bool:
         try:
-            for _ in range(fillings):
-                name = self.faker.name()
-                email = self.faker.email(domain="google.com")
-                phone_number = self.faker.phone_number()
-                address = self.faker.address()
-                self.cursor.execute(
-                    f'INSERT INTO {self.schema_name}.customers (name, email, phone_number, address) VALUES (%s, %s, %s, %s)',
-                    (name, email, phone_number, address)
-                )
-                self.connection.commit()
+            self.__write_rows("customers", TABLE_COLUMNS["customers"], customer_rows(self.generator, fillings, self.batch_size))
         except Exception as e:
             print(e)
 
             return False
-        
+
         return True
-    
+
+    def __write_bookings(self, connection, generator: BatchGenerator, chunks, fillings: int, position: int, flights: int) -> tuple[int, int]:
+        # the new seats of a chunk of flights commit with its bookings, a failed chunk leaves no seat occupied without a booking
+        checkpoint = self.fill_checkpoint if self.fill_checkpoint is not None and self.fill_checkpoint.table == "bookings" else None
+        sample_keys = partial(self.__sample_keys, generator=generator)
+        cursor = connection.cursor() if self.dataset is None else None
+
+        seated = booked = 0
+        # rows and batch indexes written since the last commit, the table policy commits them all at the end
+        pending = []
+
+        def commit() -> None:
+            self.__commit(connection, {"seats": sum(seats for _, seats, _ in pending), "bookings": sum(bookings for *_, bookings in pending)})
+            # the passenger counters of flight_data moved with the seats, only dropped once the commit can be read
+            self.cache.invalidate("flight_data")
+            for batch_index, _, bookings in pending:
+                if batch_index is not None:
+                    checkpoint.commit(batch_index, bookings)
+            pending.clear()
+
+        try:
+            for flight_ids, inventory in chunks:
+                # bookings spread evenly over the flights, the chunks of every partition add up to fillings
+                count = fillings * (position + len(flight_ids)) // flights - fillings * position // flights
+                position += len(flight_ids)
+
+                # flights without seats can not be booked
+                flight_ids = [flight_id for flight_id in flight_ids if flight_id in inventory]
+                if not flight_ids:
+                    continue
+
+                seats, bookings, occupied = book_chunk(inventory, flight_ids, count, generator, sample_keys, self.batch_size)
+                seated += len(seats)
+                booked += len(bookings)
+
+                if self.dataset is not None:
+                    self.__dump_rows("seats", SEAT_COLUMNS, seats)
+                    self.__dump_rows("bookings", TABLE_COLUMNS["bookings"], bookings)
+
+                    continue
+
+                groups = booking_groups(seats, bookings, occupied) if self.commit_policy == "row" else [(seats, bookings, occupied)]
+                for seats, bookings, occupied in groups:
+                    batch_index = checkpoint.next_batch() if checkpoint is not None and bookings else None
+                    pending.append((batch_index, len(seats), len(bookings)))
+
+                    if seats:
+                        self.__write_batch(cursor, "seats", SEAT_COLUMNS, seats)
+                    if bookings:
+                        self.__write_batch(cursor, "bookings", TABLE_COLUMNS["bookings"], bookings, checkpoint=checkpoint, batch_index=batch_index)
+                    if occupied:
+                        self.__occupy(cursor, occupied)
+
+                    if self.commit_policy != "table":
+                        commit()
+
+            if pending:
+                commit()
+        except Exception:
+            if cursor is not None:
+                connection.rollback()
+
+            raise
+        finally:
+            # a failed chunk leaves the held seats cursor of the remaining chunks open otherwise
+            chunks.close()
+            if cursor is not None:
+                cursor.close()
+
+        return seated, booked
+
+    def __book_flights(self, fillings: int) -> tuple[int, int]:
+        # every worker walks its own range of flights, one chunk at a time
+        flight_ranges = self.__flight_ranges()
+        flights = sum(count for *_, count in flight_ranges)
+        positions = np.cumsum([0, *[count for *_, count in flight_ranges]]).tolist()
+        # a chunk's new seats fill about one batch, its bookings never take more
+        chunk_flights = max(1, self.batch_size // max(1, len(self.__seat_layout()[0])))
+
+        def partition(low: int, high: int, position: int):
+            def load(connection, generator: BatchGenerator) -> tuple[int, int]:
+                return self.__write_bookings(connection, generator, self.__seat_inventories(connection, low, high, chunk_flights), fillings, position, flights)
+
+            return load
+
+        written = self.__run_partitions([partition(low, high, position) for (low, high, _), position in zip(flight_ranges, positions)])
+        # every flight has its seats now
+        self.seats_pending = False
+
+        return sum(seats for seats, _ in written), sum(bookings for _, bookings in written)
+
+    def __has_seats(self) -> bool:
+        if self.dataset is not None:
+            return False
+
+        self.cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {self.schema_name}.seats)")
+        has_seats = self.cursor.fetchone()[0]
+        self.connection.commit()
+
+        return has_seats
+
     def __fill_bookings(self, fillings: int) -> bool:
-        occupied_seats = []
         try:
-            for _ in range(fillings):
-                customer_id = self.faker.random.choice(self.get_table_ids(table="customers", column="customer_id"))
-                flight_id = self.faker.random.choice(self.get_table_ids(table="flight_data", column="flight_id"))
+            checkpoint = self.fill_checkpoint
+            if checkpoint is not None and checkpoint.batches:
+                # bookings are not generated by batch index, a resumed fill only books what is missing
+                fillings = max(fillings - checkpoint.rows, 0)
 
-                seat = self.faker.random.choice(self.get_table_ids(table="seats", column="seat_id"))
-                occupied_seats.append(seat)
+            if "customers" not in self.key_registry:
+                self.__load_keys("customers")
 
-                price = round(self.faker.random.uniform(50, 1000), 2)
-                payment_status = self.faker.boolean()
+            if not self.seats_pending and not self.__has_seats():
+                raise LookupError("No seats to book, seats have to be filled first")
 
-                self.cursor.execute(
-                    f'INSERT INTO {self.schema_name}.bookings (flight_id, customer_id, seat_id, price, payment_status) VALUES (%s, %s, %s, %s, %s)',
-                    (flight_id, customer_id, seat, price, payment_status)
-                )
+            seats, booked = self.__book_flights(fillings)
+            if seats:
+                print(f'Committed {seats} rows into seats' if self.dataset is None else f'Wrote {seats} rows of seats to {self.dataset.directory}')
 
-                self.connection.commit()
+            print(f'Committed {booked} rows into bookings' if self.dataset is None else f'Wrote {booked} rows of bookings to {self.dataset.directory}')
         except Exception as e:
             print(f"Failed to fill bookings table: {e}")
 
             return False
 
-        self.occupy_seats(occupied_seats)
-
         return True
 
     def __fill_work_orders(self, fillings: int) -> bool:
         try:
-            aircraft_ids = self.get_table_ids("aircrafts", "aircraft_registration_number")
-            maintenance_ids = self.get_table_ids("maintenance_events", "maintenance_id")
-            airport_ids = self.get_table_ids("airports", "airport_id")
-            reporteur_ids = self.get_table_ids("reporteurs", "reporteur_id")
-            
-            for _ in range(fillings):
-                aircraft_id = self.faker.random.choice(aircraft_ids)
-                maintenance_id = self.faker.random.choice(maintenance_ids)
-                airport_id = self.faker.random.choice(airport_ids)
-                reporteur_id = self.faker.random.choice(reporteur_ids)
-                
-                reporting_date = self.faker.date_between(start_date="-2y", end_date="today")
-                forecasted_date = self.faker.date_between(start_date=reporting_date, end_date="+1y")
-                due_date = self.faker.date_between(start_date=forecasted_date, end_date="+1y")
-                execution_date = self.faker.date_between(start_date=reporting_date, end_date="+1y")
-                
-                scheduled = self.faker.boolean()
-                forecasted_manhours = self.faker.random_number(fix_len=True, digits=1)
-                frequency = self.faker.random_number(fix_len=True, digits=1)
-                
-                self.cursor.execute(
-                    f"INSERT INTO {self.schema_name}.work_orders (aircraft_registration_number, maintenance_id, airport_id, execution_date, scheduled, forecasted_date, forecasted_manhours, frequency, reporteur_id, due_date, reporting_date) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                    (aircraft_id, maintenance_id, airport_id, execution_date, scheduled, forecasted_date, forecasted_manhours, frequency, reporteur_id, due_date, reporting_date)
-                )
-            
-                self.connection.commit()
+            self.__write_rows("work_orders", TABLE_COLUMNS["work_orders"], work_order_rows(self.generator, self.__sample_keys, fillings, self.batch_size))
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
+
         return True
-    
+
     def __fill_aircrafts(self, fillings: int) -> bool:
         try:
-            for _ in range(fillings):
-                aircraft_type = self.faker.random.choice(['Boeing 737', 'Airbus A320', 'Boeing 777', 'Airbus A350'])
-                aircraft_company = f'{self.faker.company()}'
-                aircraft_capacity = 300 #self.faker.random.randint(100, 400)
-
-                self.cursor.execute(
-                    f'INSERT INTO {self.schema_name}.aircrafts (aircraft_type, aircraft_company, aircraft_capacity) VALUES (%s, %s, %s)',
-                    (aircraft_type, aircraft_company, aircraft_capacity)
-                )
-
-                self.connection.commit() 
+            self.__write_rows("aircrafts", TABLE_COLUMNS["aircrafts"], aircraft_rows(self.generator, fillings, self.batch_size))
         except Exception as e:
             print(e)
-            
+
             return False
-    
+
         return True
-    
+
     def __fill_airports(self, fillings: int = 100) -> bool:
         try:
-            for _ in range(fillings): 
-                airport_id = self.faker.bothify(text='???').upper()
-                if airport_id in self.get_table_ids(table="airports", column="airport_id"):
-                    continue
-                airport_name = f'{self.faker.company()} Airport'
-                airport_city = self.faker.city()
-                airport_country = self.faker.country()
-
-                self.cursor.execute(
-                    f'INSERT INTO {self.schema_name}.airports (airport_id, airport_name, airport_city, airport_country) VALUES (%s, %s, %s, %s)',
-                    (airport_id, airport_name, airport_city, airport_country)
-                )
+            airport_ids = AIRPORT_CODES.sample(fillings, self.generator.rng, existing=self.__table_keys("airports").tolist())
 
-                self.connection.commit()  
+            self.__write_rows("airports", TABLE_COLUMNS["airports"], airport_rows(self.generator, airport_ids, self.batch_size))
         except Exception as e:
             print(f"Failed to fill airports table: {e}")
-            
+
             return False
 
         return True
-    
+
     def __fill_aircraft_slots(self, fillings: int) -> bool:
         try:
-            aircraft_ids = self.get_table_ids("aircrafts", "aircraft_registration_number")
-            maintenance_ids = self.get_table_ids("maintenance_events", "maintenance_id")
-            slot_types = ["Maintenance", "Cleaning", "Inspection", "Repair"]
-            scheduled_statuses = [True, False] 
-
-            for _ in range(fillings):
-                aircraft_registration_number = self.faker.random.choice(aircraft_ids)
-                maintenance_id = self.faker.random.choice(maintenance_ids)
-                slot_type = self.faker.random.choice(slot_types)
-                slot_scheduled = self.faker.random.choice(scheduled_statuses)
-
-                start_time = self.faker.date_time_between(start_date="-1y", end_date="now")
-                end_time = start_time + self.faker.random_element(elements=[timedelta(hours=h) for h in range(1, 13)])  # Добавляем от 1 до 12 часов
-
-                self.cursor.execute(
-                    f"INSERT INTO {self.schema_name}.aircraft_slots (aircraft_registration_number, slot_start, slot_end, slot_type, slot_scheduled, maintenance_id) VALUES (%s, %s, %s, %s, %s, %s)",
-                    (aircraft_registration_number, start_time, end_time, slot_type, slot_scheduled, maintenance_id)
-                )
+            index = self.get_interval_index("aircraft_slots")
 
-                self.connection.commit()
+            self.__write_rows("aircraft_slots", TABLE_COLUMNS["aircraft_slots"], aircraft_slot_rows(self.generator, self.__sample_keys, index, fillings, self.batch_size))
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
-        return True
-    
-    def __fill_flights(self, fillings: int) -> bool:
-        try: 
-            airports = self.get_table_ids(table="airports", column="airport_id")
-            airlines = self.get_table_ids(table="airlines", column="airline_id")
-            for _ in range(int(fillings / 5)):
-                flight_number = f'{self.faker.bothify(text="??").upper()}{self.faker.random_number(fix_len=True, digits=4)}'
 
-                origin = self.faker.random.choice(airports)
-                destination = self.faker.random.choice(airports)
+        return True
 
-                airline_id = self.faker.random.choice(airlines)
-                
-                hours = self.faker.random.randint(1, 10)
-                minutes = self.faker.random.randint(0, 59)
-                flight_length = f'{hours} hours {minutes} minutes'
+    def __fill_flights(self, fillings: int) -> bool:
+        try:
+            flight_numbers = FLIGHT_NUMBERS.sample(fillings, self.generator.rng, existing=self.__table_keys("flights").tolist())
 
-                self.cursor.execute(
-                    f'INSERT INTO {self.schema_name}.flights (flight_number, origin, destination, airline_id, flight_length) VALUES (%s, %s, %s, %s, %s)',
-                    (flight_number, origin, destination, airline_id, flight_length)
-                    )
-            
-                self.connection.commit()
+            self.__write_rows("flights", TABLE_COLUMNS["flights"], flight_rows(self.generator, self.__sample_keys, flight_numbers, self.batch_size))
         except Exception as e:
             print(f'An error occurred: {e}')
 
             return False
-        
+
         return True
-    
+
     def __fill_maintenance_events(self, fillings: int) -> bool:
         try:
-            aircraft_ids = self.get_table_ids("aircrafts", "aircraft_registration_number")
-            airport_ids = self.get_table_ids("airports", "airport_id")
-            subsystem_ids = self.get_table_ids("subsystems", "subsystem_id")
-            maintenance_type_ids = self.get_table_ids("maintenance_types", "maintenance_type_id")
-
-            for _ in range(fillings):
-                aircraft_reg = self.faker.random.choice(aircraft_ids)
-                airport_id = self.faker.random.choice(airport_ids)
-                subsystem_id = self.faker.random.choice(subsystem_ids)
-                maintenance_type_id = self.faker.random.choice(maintenance_type_ids)
-
-                maintenance_starttime = self.faker.date_time_between(start_date="-1y", end_date="now").strftime('%Y-%m-%d %H:%M:%S')
-                
-                duration_hours = self.faker.random.randint(1, 12)  
-                duration = f"{duration_hours} hours" 
-
-                self.cursor.execute(
-                    f"INSERT INTO {self.schema_name}.maintenance_events (aircraft_registration_number, maintenance_starttime, duration, airport_id, subsystem_id, maintenance_type_id) VALUES (%s, %s, %s, %s, %s, %s)",
-                    (aircraft_reg, maintenance_starttime, duration, airport_id, subsystem_id, maintenance_type_id)
-                )
+            index = self.get_interval_index("maintenance_events")
 
-                self.connection.commit()
+            self.__write_rows("maintenance_events", TABLE_COLUMNS["maintenance_events"], maintenance_event_rows(self.generator, self.__sample_keys, index, fillings, self.batch_size))
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
+
         return True
-    
+
     def __fill_subsystems(self, fillings: int) -> bool:
         try:
-            subsystem_types = ["Engine", "Avionics", "Hydraulics", "Landing Gear", "Fuel System", "Electrical System"]
-            for subsystem_type in subsystem_types:
-                self.cursor.execute(
-                    f"INSERT INTO {self.schema_name}.subsystems (subsystem_type) VALUES (%s)",
-                    (subsystem_type,)
-                )
-                self.connection.commit()
+            self.__write_rows("subsystems", TABLE_COLUMNS["subsystems"], lookup_rows("subsystems"))
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
 
         return True
-    
+
     def __fill_maintenance_types(self, fillings: int) -> bool:
         try:
-            maintenance_type_names = ["Routine Check", "Engine Repair", "Scheduled Maintenance", "Emergency Repair", "Software Update"]
-            for mainenance_type in maintenance_type_names:
-                self.cursor.execute(
-                    f"INSERT INTO {self.schema_name}.maintenance_types (maintenance_type_name) VALUES (%s)",
-                    (mainenance_type,)
-                )
-                self.connection.commit()
+            self.__write_rows("maintenance_types", TABLE_COLUMNS["maintenance_types"], lookup_rows("maintenance_types"))
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
+
         return True
-    
+
     def __fill_reporteurs(self, fillings: int):
         try:
-            for _ in range(fillings):
-                reporteur_class = self.faker.random.choice(["Steward", "Pilot", "Mechanic"])
-                reporteur_name = self.faker.name()
-
-                self.cursor.execute(
-                        f'INSERT INTO {self.schema_name}.reporteurs (reporteur_class, reporteur_name) VALUES (%s, %s)',
-                        (reporteur_class, reporteur_name)
-                    )
-                
-                self.connection.commit()
+            self.__write_rows("reporteurs", TABLE_COLUMNS["reporteurs"], reporteur_rows(self.generator, fillings, self.batch_size))
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
+
         return True
-    
+
     def __fill_reportuers(self, fillings: int):
         try:
-            for _ in range(fillings):
-                reporteur_class = self.faker.random.choice(["class1", "class2", "class3"])
-                reporteur_name = self.faker.random.choice(["name1", "name2", "name3"])
-
-                self.cursor.execute(
-                        f'INSERT INTO {self.schema_name}.reporteurs (reporteur_class, reporteur_name) VALUES (%s, %s)',
-                        (reporteur_class, reporteur_name)
+            def rows():
+                for size in self.generator.block_sizes(fillings, self.batch_size):
+                    yield from self.generator.rows(
+                        self.generator.choice(["class1", "class2", "class3"], size),
+                        self.generator.choice(["name1", "name2", "name3"], size)
                     )
-                
-                self.connection.commit()
+
+            self.__write_rows("reporteurs", ("reporteur_class", "reporteur_name"), rows())
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
+
         return True
-    
-    def __get_capacity_of_aircraft(self, aircraft: int) -> int:
-        query = f"SELECT aircraft_capacity FROM {self.schema_name}.aircrafts WHERE aircraft_registration_number = %s"
-        
-        self.cursor.execute(query, (aircraft,))
-        
-        result = self.cursor.fetchone() 
-        
-        return result[0] if result else None
-    
-    def __fill_flight_data(self, fillings: int = 100) -> bool:
-        pks = {
-            "airlines": "airline_id",
-            "flights": "flight_number",
-            "airports": "airport_id",
-            "flight_statuses": "flight_status_id",
-            "aircrafts": "aircraft_registration_number",
-            "problems": "problem_id"
-        }
-        pks_content = {}
-
-        for table, column in pks.items():
-            ids = self.get_table_ids(table, column)
-            pks_content[column] = ids
-
-        try:
-            for _ in range(100):
-                aircraft_reg = self.faker.random.choice(pks_content["aircraft_registration_number"])
-                capacity_of_aircraft = self.__get_capacity_of_aircraft(aircraft=aircraft_reg)
-                number_of_passangers = int(0.9 * capacity_of_aircraft)
-                number_of_cabin_crew = self.faker.random_number(fix_len=True, digits=1)
-                number_of_flight_crew = self.faker.random_number(fix_len=True, digits=1)
-                available_seating = capacity_of_aircraft - number_of_passangers
-
-                scheduled_departure_date = self.faker.date_between(start_date="today", end_date="+1y")
-                scheduled_departure_time = self.faker.time_object()
-                
-                fake_status_id_number = random()
-                if fake_status_id_number >= 0.8: 
-                    if fake_status_id_number <= 0.95:
-                        fligt_status = pks_content["flight_status_id"][1]
-                    else:
-                        fligt_status = pks_content["flight_status_id"][2]
-                else:
-                    fligt_status = pks_content["flight_status_id"][0]
 
-                if random() <= 0.8:
-                    problem_id = pks_content["problem_id"][0]
-                else:
-                    problem_id = self.faker.random.choice(pks_content["problem_id"])
 
-                self.cursor.execute(
-                    f'INSERT INTO {self.schema_name}.flight_data (flight_number, aircraft_registration_number, flight_status_id, problem_id, number_of_passengers, number_of_cabin_crew, number_of_flight_crew, available_seating, scheduled_departure_date, scheduled_departure_time) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
-                    (
-                        self.faker.random.choice(pks_content["flight_number"]),
-                        aircraft_reg,
-                        fligt_status,
-                        problem_id,
-                        number_of_passangers,
-                        number_of_cabin_crew,
-                        number_of_flight_crew,
-                        available_seating,
-                        scheduled_departure_date,
-                        scheduled_departure_time
-                    )
-                )
 
-                self.connection.commit()
+    def __fill_flight_data(self, fillings: int = 100) -> bool:
+        try:
+            flight_statuses = self.__table_keys("flight_statuses")
+            problem_ids = self.__table_keys("problems")
+
+            self.__write_rows(
+                "flight_data",
+                TABLE_COLUMNS["flight_data"],
+                flight_data_rows(self.generator, self.__sample_keys, flight_statuses, problem_ids, fillings, self.batch_size)
+            )
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
+
         return True
-    
+
     def __fill_flight_statuses(self, fillings: int) -> bool:
         try:
-            flight_statuses = [
-                "Cancelled",
-                "Delayed",
-                "On-time"
-            ]
-            for status in flight_statuses:
-                self.cursor.execute(
-                    f'INSERT INTO {self.schema_name}.flight_statuses (flight_status_type) VALUES (%s)',
-                    (status,)
-                )
-
-            self.connection.commit()
+            self.__write_rows("flight_statuses", TABLE_COLUMNS["flight_statuses"], lookup_rows("flight_statuses"))
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
+
         return True
-    
+
     def __fill_problems(self, fillings: int) -> bool:
         try:
-            problem_types = [
-                "Everything Ok"
-                "Engine Failure",
-                "Avionics Issue",
-                "Fuel System Leak",
-                "Hydraulic Failure",
-                "Tire Damage",
-                "Wing Deformity",
-                "Sensor Malfunction",
-                "Landing Gear Issue",
-                "Cabin Pressure Problem",
-                "Electrical System Issue"
-            ]
-            
-            for problem_type in problem_types:
-                self.cursor.execute(
-                    f'INSERT INTO {self.schema_name}.problems (problem_type) VALUES (%s)',
-                    (problem_type,)
-                )
-
-            self.connection.commit()
+            self.__write_rows("problems", TABLE_COLUMNS["problems"], lookup_rows("problems"))
         except Exception as e:
             print(f"An error occurred: {e}")
 
             return False
-        
+
         return True
     
-    def fill_table(self, table: str, fillings: int = 100) -> bool:
-        fill = self.filling_mapper[table](fillings)
+    def __create_progress_table(self) -> None:
+        self.cursor.execute("SELECT to_regclass(%s)", (f'{self.schema_name}.{FILL_PROGRESS}',))
+        if self.cursor.fetchone()[0] is None:
+            self.cursor.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.schema_name}.{FILL_PROGRESS} (
+                   table_name text NOT NULL,
+                   batch_index integer NOT NULL,
+                   rows integer NOT NULL,
+                   seed bigint NOT NULL,
+                   fillings bigint NOT NULL,
+                   batch_size integer NOT NULL,
+                   committed_at timestamptz NOT NULL DEFAULT now(),
+                   PRIMARY KEY (table_name, batch_index)
+                )"""
+            )
+
+        self.connection.commit()
+
+    def __load_checkpoint(self, table: str, fillings: int) -> FillCheckpoint:
+        self.__create_progress_table()
+        self.cursor.execute(
+            f"SELECT batch_index, rows, seed, fillings, batch_size, committed_at::date FROM {self.schema_name}.{FILL_PROGRESS} WHERE table_name = %s",
+            (table,)
+        )
+        progress = self.cursor.fetchall()
+        self.connection.commit()
+
+        # batch indexes only mean the same rows for the same seed, fillings and batch size
+        if any((seed, recorded_fillings, batch_size) != (self.seed, fillings, self.batch_size) for _, _, seed, recorded_fillings, batch_size, _ in progress):
+            raise RuntimeError(f'{table} has checkpoints of a fill with another seed, fillings or batch_size, reset_checkpoints drops them')
+
+        checkpoint = FillCheckpoint(
+            table,
+            self.seed,
+            fillings,
+            self.batch_size,
+            {batch_index: rows for batch_index, rows, *_ in progress if batch_index != COMPLETE_BATCH},
+            complete=any(batch_index == COMPLETE_BATCH for batch_index, *_ in progress),
+            started_on=min((committed_on for *_, committed_on in progress), default=None)
+        )
+        if checkpoint.batches and not checkpoint.complete:
+            print(f'Resuming {table}, {len(checkpoint.batches)} batches with {checkpoint.rows} rows were committed before')
+
+        return checkpoint
+
+    def __record_batch(self, cursor, checkpoint: FillCheckpoint, batch_index: int, rows: int) -> None:
+        cursor.execute(
+            f"INSERT INTO {self.schema_name}.{FILL_PROGRESS} (table_name, batch_index, rows, seed, fillings, batch_size) VALUES (%s, %s, %s, %s, %s, %s)",
+            (checkpoint.table, batch_index, rows, checkpoint.seed, checkpoint.fillings, checkpoint.batch_size)
+        )
+
+    def __complete_checkpoint(self, checkpoint: FillCheckpoint) -> None:
+        self.__record_batch(self.cursor, checkpoint, COMPLETE_BATCH, checkpoint.rows)
+        self.connection.commit()
+        checkpoint.complete = True
+
+    def reset_checkpoints(self, tables: list[str] = None) -> int:
+        # the next checkpointed fill of these tables starts over, their rows stay where they are
+        self.__create_progress_table()
+        if tables is None:
+            self.cursor.execute(f"DELETE FROM {self.schema_name}.{FILL_PROGRESS}")
+        else:
+            self.cursor.execute(f"DELETE FROM {self.schema_name}.{FILL_PROGRESS} WHERE table_name = ANY(%s)", (list(tables),))
+        deleted = self.cursor.rowcount
+        self.connection.commit()
+
+        return deleted
+
+    def fill_table(self, table: str, fillings: int = 100, load_method: str = None, commit_policy: str = None, workers: int = None, pipeline_depth: int = None) -> bool:
+        default_load_method, default_commit_policy, default_workers, default_pipeline_depth = self.load_method, self.commit_policy, self.workers, self.pipeline_depth
+        if load_method is not None:
+            if load_method not in LOAD_METHODS:
+                raise ValueError(f'Unknown load method {load_method}, expected one of {LOAD_METHODS}')
+            self.load_method = load_method
+        if commit_policy is not None:
+            if commit_policy not in COMMIT_POLICIES:
+                raise ValueError(f'Unknown commit policy {commit_policy}, expected one of {COMMIT_POLICIES}')
+            if self.checkpoint and commit_policy == "row":
+                raise ValueError('checkpoints are kept per batch, they can not be combined with the row commit policy')
+            self.commit_policy = commit_policy
+        if workers is not None:
+            if not 1 <= workers <= self.pool_size:
+                raise ValueError(f'workers must be between 1 and pool_size ({self.pool_size})')
+            self.workers = workers
+        if pipeline_depth is not None:
+            if pipeline_depth < 0:
+                raise ValueError('pipeline_depth can not be negative')
+            self.pipeline_depth = pipeline_depth
+
+        if self.instrumentation is not None:
+            start, db_seconds, committed_rows = time.perf_counter(), self.instrumentation.db_seconds, sum(self.committed_rows.values())
+
+        default_generator = self.generator
+        try:
+            if self.seed is None or self.dataset is not None:
+                fill = self.filling_mapper[table](fillings)
+            else:
+                fill = self.__fill_seeded(table, fillings)
+        finally:
+            self.load_method, self.commit_policy, self.workers, self.pipeline_depth = default_load_method, default_commit_policy, default_workers, default_pipeline_depth
+            self.generator = default_generator
+            self.fill_checkpoint = None
+
+        if self.instrumentation is not None:
+            seconds = time.perf_counter() - start
+            # with several workers the I/O of parallel connections adds up to more than the wall time
+            db_seconds = self.instrumentation.db_seconds - db_seconds
+            self.instrumentation.record(
+                "fill_table",
+                seconds,
+                table=table,
+                ok=fill,
+                fill_seconds=seconds,
+                db_seconds=db_seconds,
+                generation_seconds=max(seconds - db_seconds, 0.0),
+                committed_rows=sum(self.committed_rows.values()) - committed_rows
+            )
+
         if fill:
             print(f'Successfully filled {table} with {fillings}')
         else:
-            print(f'Can not fill {table}')
\ No newline at end of file
+            print(f'Can not fill {table}')
+
+        return fill
+
+    def __fill_seeded(self, table: str, fillings: int) -> bool:
+        try:
+            checkpoint = self.__load_checkpoint(table, fillings) if self.checkpoint and table not in UNCHECKPOINTED_TABLES else None
+        except Exception as e:
+            print(f'Can not load the checkpoint of {table}: {e}')
+
+            return False
+
+        if checkpoint is not None and checkpoint.complete:
+            print(f'Skipping {table}, its checkpoint is complete')
+
+            return True
+
+        # keys are reloaded in key order, so a batch samples the same keys on a resume as in the first run
+        self.key_registry = KeyRegistry()
+        self.generator = self.generator.for_table(table, checkpoint)
+        self.fill_checkpoint = checkpoint
+
+        fill = self.filling_mapper[table](fillings)
+        if fill and checkpoint is not None:
+            try:
+                self.__complete_checkpoint(checkpoint)
+            except Exception as e:
+                print(f'Can not complete the checkpoint of {table}: {e}')
+
+                return False
+
+        return fill
+
+    def __aircraft_available_from(self) -> dict[int, int]:
+        # departures already in flight_data are never overlapped, an aircraft is only free once it landed from its last one
+        self.cursor.execute(
+            f"""SELECT fd.aircraft_registration_number, MAX(EXTRACT(EPOCH FROM fd.scheduled_departure_date + fd.scheduled_departure_time + f.flight_length))::bigint
+               FROM {self.schema_name}.flight_data fd JOIN {self.schema_name}.flights f ON f.flight_number = fd.flight_number
+               GROUP BY fd.aircraft_registration_number"""
+        )
+
+        return dict(self.cursor.fetchall())
+
+    def fill_flight_schedule(self, start: date = None, months: int = 1, weekdays: tuple[int] = DAILY, turnaround: timedelta = timedelta(minutes=45)) -> bool:
+        if not self.flush_seats():
+            return False
+
+        try:
+            if self.dataset is not None:
+                raise RuntimeError("The schedule is expanded from the flights in the database, it can not be materialized")
+
+            start = start or date.today()
+            days = (add_months(start, months) - start).days
+
+            flight_numbers, flight_seconds = [], []
+            for rows in self.iter_table_content("flights", columns=["flight_number", "EXTRACT(EPOCH FROM flight_length)::bigint"], as_dicts=False):
+                flight_numbers.extend(flight_number for flight_number, _ in rows)
+                flight_seconds.extend(seconds for _, seconds in rows)
+            if not flight_numbers:
+                raise LookupError("No flights to schedule, flights have to be filled first")
+
+            rotation = AircraftRotation(
+                self.__table_keys("aircrafts"),
+                turnaround // timedelta(seconds=1),
+                self.__aircraft_available_from()
+            )
+
+            written = self.__write_rows(
+                "flight_data",
+                TABLE_COLUMNS["flight_data"],
+                flight_schedule_rows(
+                    self.generator,
+                    self.__sample_keys,
+                    self.__table_keys("flight_statuses"),
+                    self.__table_keys("problems"),
+                    flight_numbers,
+                    np.array(flight_seconds, dtype=np.int64),
+                    rotation,
+                    start,
+                    days,
+                    weekdays,
+                    self.batch_size
+                )
+            )
+
+            print(f'Scheduled {written} departures of {len(flight_numbers)} flights over {days} days, {rotation.unassigned} found no free aircraft')
+        except Exception as e:
+            print(f"Failed to expand the flight schedule: {e}")
+
+            return False
+
+        return True
+
+    def fill_tables(self, tables: list[str] = None, fillings: int = 100, workers: int = None, scale_factor: float = None) -> dict[str, bool]:
+        tables = list(self.filling_mapper) if tables is None else tables
+        dependencies = build_dependency_graph(tables, self.get_foreign_keys())
+
+        if scale_factor is not None:
+            fillings = scale_fillings(scale_factor, {"airports": AIRPORT_CODES.size, "flights": FLIGHT_NUMBERS.size})
+        if self.checkpoint:
+            # created up front, so the worker processes do not race to create it
+            self.__create_progress_table()
+
+        try:
+            return run_dependency_graph(dependencies, self.get_connection_params(), fillings, workers, self.instrumentation, JOINED_FILLS)
+        finally:
+            # the tables were written by other processes, nothing cached here can be trusted
+            self.cache.clear()
+
+    def get_deferrable_objects(self, tables: list[str]) -> list[tuple[str, str, str, str, str]]:
+        # foreign keys and plain indexes only, primary and unique keys keep guarding the loaded ids
+        self.cursor.execute(
+            """SELECT source.relname, 'constraint', c.conname, pg_get_constraintdef(c.oid), target.relname FROM pg_constraint c
+               JOIN pg_class source ON source.oid = c.conrelid
+               JOIN pg_class target ON target.oid = c.confrelid
+               JOIN pg_namespace n ON n.oid = source.relnamespace
+               WHERE c.contype = 'f' AND n.nspname = %s AND source.relname = ANY(%s)
+               UNION ALL
+               SELECT table_class.relname, 'index', index_class.relname, pg_get_indexdef(i.indexrelid), NULL FROM pg_index i
+               JOIN pg_class index_class ON index_class.oid = i.indexrelid
+               JOIN pg_class table_class ON table_class.oid = i.indrelid
+               JOIN pg_namespace n ON n.oid = table_class.relnamespace
+               WHERE n.nspname = %s AND table_class.relname = ANY(%s)
+               AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)""",
+            (self.schema_name, list(tables), self.schema_name, list(tables))
+        )
+
+        return self.cursor.fetchall()
+
+    def __drop_deferrable_objects(self, tables: list[str]) -> None:
+        objects = self.get_deferrable_objects(tables)
+
+        try:
+            self.cursor.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.schema_name}.{BULK_LOAD_JOURNAL} (
+                   table_name text NOT NULL,
+                   kind text NOT NULL,
+                   name text NOT NULL,
+                   definition text NOT NULL,
+                   reference text,
+                   PRIMARY KEY (table_name, kind, name))"""
+            )
+
+            # the loaded tables are journaled too, so a restore after a crash still analyzes every one of them
+            for table in tables:
+                self.cursor.execute(
+                    f"INSERT INTO {self.schema_name}.{BULK_LOAD_JOURNAL} VALUES (%s, 'table', %s, '', NULL) ON CONFLICT DO NOTHING",
+                    (table, table)
+                )
+
+            # the definitions are journaled in the same transaction that drops them, so they are never lost
+            for table, kind, name, definition, reference in objects:
+                self.cursor.execute(
+                    f'INSERT INTO {self.schema_name}.{BULK_LOAD_JOURNAL} VALUES (%s, %s, %s, %s, %s) ON CONFLICT DO NOTHING',
+                    (table, kind, name, definition.removesuffix(" NOT VALID"), reference)
+                )
+                if kind == "constraint":
+                    self.cursor.execute(f'ALTER TABLE {self.schema_name}.{table} DROP CONSTRAINT {name}')
+                else:
+                    self.cursor.execute(f'DROP INDEX {self.schema_name}.{name}')
+
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+
+            raise
+
+        print(f'Dropped {len(objects)} foreign keys and indexes of {", ".join(tables)}')
+
+    def restore_bulk_load(self, workers: int = None) -> list[str]:
+        if not self.__has_bulk_load_journal():
+            return []
+
+        self.cursor.execute(f"SELECT table_name, kind, name, definition FROM {self.schema_name}.{BULK_LOAD_JOURNAL} WHERE kind <> 'table'")
+        objects = self.cursor.fetchall()
+        self.cursor.execute(f"SELECT table_name FROM {self.schema_name}.{BULK_LOAD_JOURNAL} WHERE kind = 'table'")
+        loaded = [table for table, in self.cursor.fetchall()]
+
+        try:
+            # NOT VALID only takes brief locks, the table scans happen in the parallel validation below
+            for table, kind, name, definition in objects:
+                if kind != "constraint":
+                    continue
+
+                self.cursor.execute(
+                    "SELECT 1 FROM pg_constraint c JOIN pg_class t ON t.oid = c.conrelid JOIN pg_namespace n ON n.oid = t.relnamespace WHERE n.nspname = %s AND t.relname = %s AND c.conname = %s",
+                    (self.schema_name, table, name)
+                )
+                if self.cursor.fetchone() is None:
+                    self.cursor.execute(f'ALTER TABLE {self.schema_name}.{table} ADD CONSTRAINT {name} {definition} NOT VALID')
+
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+
+            raise
+
+        tables = sorted({table for table, _, _, _ in objects})
+        workers = min(workers or self.pool_size, self.pool_size)
+
+        def partition(table_range: list[str]):
+            def restore(connection, generator: BatchGenerator) -> list[str]:
+                failures = []
+
+                with connection.cursor() as cursor:
+                    for table, kind, name, definition in sorted(objects, key=lambda item: item[1] == "constraint"):
+                        if table not in table_range:
+                            continue
+
+                        try:
+                            if kind == "constraint":
+                                cursor.execute(f'ALTER TABLE {self.schema_name}.{table} VALIDATE CONSTRAINT {name}')
+                            else:
+                                cursor.execute(definition.replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+                            cursor.execute(
+                                f'DELETE FROM {self.schema_name}.{BULK_LOAD_JOURNAL} WHERE table_name = %s AND kind = %s AND name = %s',
+                                (table, kind, name)
+                            )
+
+                            connection.commit()
+                        except psycopg2.Error as e:
+                            connection.rollback()
+                            failures.append(f'{table}.{name}: {e}'.strip())
+
+                return failures
+
+            return restore
+
+        failures = self.__run_partitions([partition(tables[i::workers]) for i in range(min(workers, len(tables)))])
+        failures = [failure for partition_failures in failures for failure in partition_failures]
+
+        # every loaded table gets fresh statistics, not only the ones that had foreign keys or indexes dropped
+        for table in sorted({*tables, *loaded}):
+            self.cursor.execute(f'ANALYZE {self.schema_name}.{table}')
+        self.cursor.execute(f"DELETE FROM {self.schema_name}.{BULK_LOAD_JOURNAL} WHERE kind = 'table'")
+        self.connection.commit()
+
+        print(f'Restored {len(objects) - len(failures)} of {len(objects)} foreign keys and indexes')
+
+        return failures
+
+    @contextmanager
+    def bulk_load(self, tables: list[str] = None, workers: int = None):
+        tables = list(self.filling_mapper) if tables is None else tables
+
+        self.__drop_deferrable_objects(tables)
+        try:
+            yield self
+        finally:
+            try:
+                self.flush_seats()
+            finally:
+                failures = self.restore_bulk_load(workers)
+                if failures:
+                    raise RuntimeError(f'Constraints left NOT VALID, the journal in {BULK_LOAD_JOURNAL} keeps them: {"; ".join(failures)}')
+
+    def materialize(self, directory: str, tables: list[str] = None, fillings: int = 100, scale_factor: float = None, file_format: str = "binary") -> dict[str, bool]:
+        tables = list(self.filling_mapper) if tables is None else tables
+        dependencies = build_dependency_graph(tables, self.get_foreign_keys())
+        order = order_dependency_graph(dependencies)
+
+        if scale_factor is not None:
+            fillings = scale_fillings(scale_factor, {"airports": AIRPORT_CODES.size, "flights": FLIGHT_NUMBERS.size})
+        if not isinstance(fillings, dict):
+            fillings = {table: fillings for table in tables}
+
+        if not self.flush_seats():
+            raise RuntimeError("Can not materialize while deferred seats fail to write")
+
+        default_registry, default_indexes, default_defer_seats = self.key_registry, self.interval_indexes, self.defer_seats
+        self.defer_seats = "bookings" in tables
+        self.dataset = DatasetWriter(directory, self.schema_name, self.column_types, self.primary_keys, file_format)
+        self.key_registry, self.interval_indexes = KeyRegistry(), {}
+        results = {}
+
+        try:
+            for table in order:
+                failed = [reference for reference in dependencies[table] if not results[reference]]
+                if failed:
+                    print(f'Skipping {table}, dependencies failed: {", ".join(sorted(failed))}')
+                    results[table] = False
+
+                    continue
+
+                results[table] = self.fill_table(table, fillings[table])
+
+            self.flush_seats()
+        finally:
+            self.dataset.close()
+            self.dataset = None
+            # seats deferred while materializing belong to the dataset, never to the database
+            self.seats_pending = False
+            self.key_registry, self.interval_indexes, self.defer_seats = default_registry, default_indexes, default_defer_seats
+
+        return results
+
+    def load_dataset(self, directory: str, tables: list[str] = None) -> dict[str, int]:
+        if not self.flush_seats():
+            raise RuntimeError("Can not load a dataset while deferred seats fail to write")
+
+        loaded = load_dataset(self.connection, self.schema_name, directory, tables)
+        self.cache.clear()
+
+        if "flight_data" in loaded or "seats" in loaded:
+            # materialized flights are written before their seats, the counters are only known once both are loaded
+            self.reconcile_occupancy()
+
+        # keys and seats cached from before the load are incomplete now
+        self.key_registry = KeyRegistry()
+        self.seat_layout = None
+        self.interval_indexes = {}
+
+        return loaded
@@ -0,0 +1,893 @@
+import asyncio
+import time
+from contextlib import aclosing, nullcontext
+from contextvars import ContextVar
+
+import asyncpg
+import numpy as np
+
+from postgres_orm import BULK_LOAD_JOURNAL, COMMIT_POLICIES, LOAD_METHODS, SEAT_COLUMNS, UNSAMPLED_TABLES
+from postgres_orm.bulk import chunked
+from postgres_orm.cache import TableCache
+from postgres_orm.columnar import ColumnBuilder
+from postgres_orm.generators import BatchGenerator
+from postgres_orm.instrumentation import Instrumentation
+from postgres_orm.intervals import IntervalIndex
+from postgres_orm.inventory import SeatInventory
+from postgres_orm.queries import (
+    COUNT_SEATS, FLIGHT_CHUNK, FLIGHT_RANGES, FOREIGN_KEYS, JOURNAL_FOREIGN_KEYS, OCCUPANCY, OCCUPY_SEATS, RANGE_HAS_SEATS, RANGE_SEATS,
+    RECONCILE_OCCUPANCY, UNSEATED_FLIGHTS, build_query
+)
+from postgres_orm.registry import KeyRegistry
+from postgres_orm.rows import (
+    AIRPORT_CODES, FLIGHT_NUMBERS, SAMPLED_KEYS, TABLE_COLUMNS, WINDOW_COLUMNS, aircraft_rows, aircraft_slot_rows, airline_rows, airport_rows,
+    book_chunk, booking_groups, customer_rows, flight_data_rows, flight_rows, lookup_rows, maintenance_event_rows, reporteur_rows, work_order_rows
+)
+from postgres_orm.scale import scale_fillings
+from postgres_orm.schema import FILL_PROGRESS, SCHEMA_SNAPSHOTS, SchemaSnapshot, schema_query
+from postgres_orm.scheduler import build_dependency_graph
+
+
+async def generate_batches(rows, size: int, depth: int = 0):
+    # rows are generated in a worker thread, so building a batch never stalls the event loop
+    batches = chunked(rows, size)
+    if not depth:
+        while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+            yield batch
+
+        return
+
+    # a producer task runs ahead of the writer by at most depth batches
+    queue = asyncio.Queue(maxsize=depth)
+
+    async def produce():
+        try:
+            while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+                await queue.put((batch, None))
+            await queue.put((None, None))
+        except Exception as e:
+            await queue.put((None, e))
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            batch, error = await queue.get()
+            if error is not None:
+                raise error
+            if batch is None:
+                return
+
+            yield batch
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+class AsyncPostgresORM:
+    def __init__(self, host: str, port: str, username: str, password: str, db_name: str, schema_name: str, load_method: str = "insert", commit_policy: str = "batch", batch_size: int = 10_000, workers: int = 1, pool_size: int = 8, instrumentation: Instrumentation = None, cache_entries: int = 128, cache_rows: int = 100_000, pipeline_depth: int = 0):
+        if load_method not in LOAD_METHODS:
+            raise ValueError(f'Unknown load method {load_method}, expected one of {LOAD_METHODS}')
+        if commit_policy not in COMMIT_POLICIES:
+            raise ValueError(f'Unknown commit policy {commit_policy}, expected one of {COMMIT_POLICIES}')
+        if batch_size < 1:
+            raise ValueError('batch_size must be positive')
+        if not 1 <= workers <= pool_size:
+            raise ValueError(f'workers must be between 1 and pool_size ({pool_size})')
+        if pipeline_depth < 0:
+            raise ValueError('pipeline_depth can not be negative')
+
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.db_name = db_name
+
+        self.schema_name = schema_name
+        self.instrumentation = instrumentation
+
+        self.generator = BatchGenerator()
+
+        self.load_method = load_method
+        self.commit_policy = commit_policy
+        self.batch_size = batch_size
+        self.workers = workers
+        self.pool_size = pool_size
+        self.pipeline_depth = pipeline_depth
+        # overrides of a fill_table call, every task sees only the ones of the fill it belongs to
+        self.fill_options = ContextVar(f'fill_options_{id(self)}', default={})
+        self.pool = None
+
+        self.filling_mapper = {}
+        self.primary_keys = {}
+        self.column_types = {}
+        self.key_registry = KeyRegistry()
+        self.key_lock = asyncio.Lock()
+        # seat numbers and classes of a flight, read once from seat_classes
+        self.seat_layout = None
+        # fills that run bookings after seats defer the seats, so they are written once with their final status
+        self.defer_seats = False
+        # set by a deferred seats fill, the next bookings fill or flush writes seats for every flight that has none
+        self.seats_pending = False
+        self.seat_lock = asyncio.Lock()
+        self.interval_indexes = {}
+        self.cache = TableCache(cache_entries, cache_rows)
+        self.committed_rows = {}
+        self.commit_count = 0
+
+    async def open(self) -> "AsyncPostgresORM":
+        if self.pool is not None:
+            return self
+
+        try:
+            self.pool = await asyncpg.create_pool(
+                host=self.host or None,
+                port=self.port or None,
+                user=self.username,
+                password=self.password,
+                database=self.db_name,
+                min_size=1,
+                max_size=self.pool_size,
+                init=self.__init_connection if self.instrumentation is not None else None
+            )
+            print(f'Successfully connected to {self.db_name}')
+        except Exception as e:
+            raise ConnectionError(f'Can not connect to {self.db_name}: {e}') from e
+
+        await self.refresh_schema(reload=False)
+
+        return self
+
+    @property
+    def faker(self):
+        return self.generator.faker
+
+    async def refresh_schema(self, reload: bool = True) -> SchemaSnapshot:
+        # the snapshot is shared by the process, tables created or altered after it was taken need a refresh
+        key = (self.host, self.port, self.db_name, self.schema_name)
+        if reload:
+            SCHEMA_SNAPSHOTS.pop(key, None)
+        if key not in SCHEMA_SNAPSHOTS:
+            SCHEMA_SNAPSHOTS[key] = SchemaSnapshot(await self.pool.fetch(schema_query("$1"), self.schema_name))
+
+        schema = SCHEMA_SNAPSHOTS[key]
+        self.filling_mapper = {
+            table: getattr(self, f'_AsyncPostgresORM__fill_{table}')
+            for table in schema.tables
+        }
+        self.primary_keys = schema.primary_keys
+        self.column_types = schema.column_types
+
+        return schema
+
+    async def close(self) -> None:
+        if self.pool is None:
+            return
+
+        flushed = await self.flush_seats()
+
+        await self.pool.close()
+        self.pool = None
+
+        if not flushed:
+            raise RuntimeError("Deferred seats failed to write, they are lost with the pool")
+
+    async def __aenter__(self) -> "AsyncPostgresORM":
+        return await self.open()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def __init_connection(self, connection: asyncpg.Connection) -> None:
+        connection.add_query_logger(self.__log_query)
+
+    def __log_query(self, record) -> None:
+        self.instrumentation.record("execute", record.elapsed, query=record.query)
+
+    async def get_tables(self) -> list[str]:
+        try:
+            results = await self.pool.fetch(
+                "SELECT table_name FROM information_schema.tables WHERE table_schema = $1 AND table_name <> ALL($2)",
+                self.schema_name,
+                [BULK_LOAD_JOURNAL, FILL_PROGRESS]
+            )
+
+            return [result[0] for result in results]
+        except Exception as e:
+            print(f'Can not get tables from {self.db_name}')
+
+    async def get_foreign_keys(self) -> dict[str, set[str]]:
+        references = await self.pool.fetch(build_query(FOREIGN_KEYS, self.schema_name, "$1"), self.schema_name)
+
+        if await self.pool.fetchval("SELECT to_regclass($1)", f'{self.schema_name}.{BULK_LOAD_JOURNAL}') is not None:
+            references += await self.pool.fetch(build_query(JOURNAL_FOREIGN_KEYS, self.schema_name))
+
+        foreign_keys = {}
+        for table, reference in references:
+            foreign_keys.setdefault(table, set()).add(reference)
+
+        return foreign_keys
+
+    def invalidate_cache(self, table: str = None) -> None:
+        if table is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate(table)
+
+    async def get_table_ids(self, table: str, column: str) -> list[int]:
+        if table == "seats" and not await self.flush_seats():
+            raise RuntimeError("Can not read seats while deferred seats fail to write")
+
+        start = time.perf_counter() if self.instrumentation is not None else None
+
+        ids = self.cache.get(table, column)
+        if ids is None:
+            ids = tuple(result[0] for result in await self.pool.fetch(f"SELECT {column} FROM {self.schema_name}.{table}"))
+            self.cache.put(table, column, ids, len(ids))
+
+        if self.instrumentation is not None:
+            self.instrumentation.record("get_table_ids", time.perf_counter() - start, table=table, ids_read=len(ids))
+
+        return list(ids)
+
+    async def get_table_content(self, table: str) -> list[dict]:
+        try:
+            if table == "seats" and not await self.flush_seats():
+                raise RuntimeError("deferred seats fail to write")
+
+            content = self.cache.get(table, "*")
+            if content is None:
+                results = await self.pool.fetch(f"SELECT * FROM {self.schema_name}.{table}")
+
+                content = (list(results[0].keys()) if results else [], [tuple(result) for result in results])
+                self.cache.put(table, "*", content, len(content[1]))
+
+            columns, rows = content
+
+            # fresh dicts on every call, callers may change them without touching the cache
+            return [dict(zip(columns, row)) for row in rows]
+        except Exception as e:
+            print(f"Error retrieving data from {table}. Error - {e}")
+            return []
+
+    async def iter_table_content(self, table: str, columns: list[str] = None, where: str = None, params: tuple = None, itersize: int = 10_000, as_dicts: bool = True):
+        # where takes asyncpg placeholders, $1 for the first value of params
+        query = f'SELECT {", ".join(columns) if columns else "*"} FROM {self.schema_name}.{table}'
+        if where:
+            query += f' WHERE {where}'
+        if table == "seats" and not await self.flush_seats():
+            raise RuntimeError("Can not read seats while deferred seats fail to write")
+
+        async with self.pool.acquire() as connection:
+            # a server side cursor only lives as long as its transaction
+            async with connection.transaction():
+                cursor = await connection.cursor(query, *(params or ()))
+
+                while rows := await cursor.fetch(itersize):
+                    if as_dicts:
+                        yield [dict(row.items()) for row in rows]
+                    else:
+                        yield [tuple(row) for row in rows]
+
+    async def get_table_columns(self, table: str, columns: list[str] = None, where: str = None, params: tuple = None, itersize: int = 100_000) -> dict:
+        column_types = self.column_types[table]
+        builders = [ColumnBuilder(column, column_types[column]) for column in columns or column_types]
+
+        async for rows in self.iter_table_content(
+            table,
+            columns=[builder.select_expression() for builder in builders],
+            where=where,
+            params=params,
+            itersize=itersize,
+            as_dicts=False
+        ):
+            for builder, values in zip(builders, zip(*rows)):
+                builder.append(values)
+
+        return {builder.name: builder.build() for builder in builders}
+
+    def __option(self, name: str):
+        return self.fill_options.get().get(name, getattr(self, name))
+
+    async def __reserve_ids(self, connection: asyncpg.Connection, table: str, count: int) -> list[int]:
+        results = await connection.fetch(
+            "SELECT nextval(pg_get_serial_sequence($1, $2)) FROM generate_series(1, $3)",
+            f'{self.schema_name}.{table}',
+            self.primary_keys[table],
+            count
+        )
+
+        return [result[0] for result in results]
+
+    async def __keyed_rows(self, connection: asyncpg.Connection, table: str, columns: tuple[str], rows: list[tuple]) -> tuple[tuple[str], list[tuple], list]:
+        primary_key = self.primary_keys[table]
+        if primary_key in columns:
+            return columns, rows, [row[columns.index(primary_key)] for row in rows]
+
+        # serial ids are drawn up front, so neither method needs RETURNING to learn the keys
+        keys = await self.__reserve_ids(connection, table, len(rows))
+
+        return (*columns, primary_key), [(*row, key) for row, key in zip(rows, keys)], keys
+
+    async def __insert_rows(self, connection: asyncpg.Connection, table: str, columns: tuple[str], rows: list[tuple]) -> list:
+        columns, rows, keys = await self.__keyed_rows(connection, table, columns, rows)
+
+        # executemany pipelines the statements, the batch costs one round trip instead of one per row
+        await connection.executemany(
+            f'INSERT INTO {self.schema_name}.{table} ({", ".join(columns)}) VALUES ({", ".join(f"${i}" for i in range(1, len(columns) + 1))})',
+            rows
+        )
+
+        return keys
+
+    async def __copy_rows(self, connection: asyncpg.Connection, table: str, columns: tuple[str], rows: list[tuple]) -> list:
+        columns, rows, keys = await self.__keyed_rows(connection, table, columns, rows)
+
+        start = time.perf_counter()
+        await connection.copy_records_to_table(table, records=rows, columns=columns, schema_name=self.schema_name)
+        if self.instrumentation is not None:
+            # query loggers do not see COPY, so it is timed here
+            self.instrumentation.record("copy", time.perf_counter() - start, query=f'COPY {self.schema_name}.{table} ({", ".join(columns)}) FROM STDIN', rows=len(rows))
+
+        return keys
+
+    def __committed(self, rows: dict[str, int]) -> None:
+        self.commit_count += 1
+        for table, count in rows.items():
+            self.cache.invalidate(table)
+            self.committed_rows[table] = self.committed_rows.get(table, 0) + count
+
+    async def __load_keys(self, table: str) -> None:
+        primary_key = self.primary_keys[table]
+        integer_keys = self.column_types[table][primary_key] == "integer"
+
+        self.key_registry.add(table, [], integer_keys=integer_keys)
+        async for results in self.iter_table_content(table, columns=[primary_key], as_dicts=False, itersize=self.batch_size):
+            self.key_registry.add(table, [result[0] for result in results], integer_keys=integer_keys)
+
+    async def __ensure_keys(self, tables) -> None:
+        # keys are loaded before a fill takes a connection, a fill waiting here never holds one the loader needs
+        async with self.key_lock:
+            for table in tables:
+                if table not in self.key_registry:
+                    await self.__load_keys(table)
+
+    def __sampler(self, generator: BatchGenerator):
+        return lambda table, size: self.key_registry.sample(table, size, generator.rng)
+
+    def __register_keys(self, table: str, batches: list[tuple[list, list[tuple]]]) -> None:
+        for keys, _ in batches:
+            self.key_registry.add(table, keys)
+
+    async def __write_rows(self, table: str, columns: tuple[str], rows, connection: asyncpg.Connection = None) -> int:
+        register = table not in UNSAMPLED_TABLES
+        if register:
+            await self.__ensure_keys([table])
+
+        if connection is None:
+            async with self.pool.acquire() as connection:
+                return await self.__write_rows(table, columns, rows, connection)
+
+        commit_policy = self.__option("commit_policy")
+
+        # uncommitted rows are visible to reads on this connection, so the cache drops the table up front too
+        self.cache.invalidate(table)
+        batch_size = 1 if commit_policy == "row" else self.batch_size
+
+        written = 0
+        pending = []
+        failed_rows = 0
+
+        # with the table policy every batch is a savepoint of one transaction, otherwise a transaction of its own
+        transaction = connection.transaction() if commit_policy == "table" else None
+        if transaction is not None:
+            await transaction.start()
+
+        try:
+            async with aclosing(generate_batches(rows, batch_size, self.__option("pipeline_depth"))) as batches:
+                async for batch in batches:
+                    try:
+                        async with connection.transaction():
+                            batch_keys = await self.__write_batch(connection, table, columns, batch)
+                    except asyncpg.PostgresError as e:
+                        failed_rows += len(batch)
+                        print(f'Rolled back batch of {len(batch)} rows in {table}: {e}')
+
+                        continue
+
+                    if transaction is not None:
+                        pending.append((batch_keys, batch))
+
+                        continue
+
+                    self.__committed({table: len(batch_keys)})
+                    if register:
+                        self.__register_keys(table, [(batch_keys, batch)])
+                    written += len(batch_keys)
+        except BaseException:
+            if transaction is not None:
+                await transaction.rollback()
+
+            raise
+
+        if transaction is not None:
+            await transaction.commit()
+
+            self.__committed({table: sum(len(batch_keys) for batch_keys, _ in pending)})
+            if register:
+                self.__register_keys(table, pending)
+            written += sum(len(batch_keys) for batch_keys, _ in pending)
+
+        print(f'Committed {written} rows into {table}')
+
+        if failed_rows:
+            raise RuntimeError(f'{failed_rows} rows of {table} were rolled back')
+
+        return written
+
+    async def __write_batch(self, connection: asyncpg.Connection, table: str, columns: tuple[str], batch: list[tuple]) -> list:
+        write = self.__copy_rows if self.__option("load_method") == "copy" else self.__insert_rows
+        batch_keys = await write(connection, table, columns, batch)
+        if table == "seats":
+            await self.__count_seats(connection, batch)
+
+        return batch_keys
+
+    async def __count_seats(self, connection: asyncpg.Connection, rows: list[tuple]) -> None:
+        deltas = {}
+        for _, _, seat_status, flight_id in rows:
+            delta = deltas.setdefault(flight_id, [0, 0])
+            delta[0 if seat_status == "Occupied" else 1] += 1
+
+        await connection.execute(
+            build_query(COUNT_SEATS, self.schema_name, "$1", "$2", "$3"),
+            list(deltas), [passengers for passengers, _ in deltas.values()], [available for _, available in deltas.values()]
+        )
+        self.cache.invalidate("flight_data")
+
+    async def get_occupancy(self, flight_ids: list[int]) -> dict[int, tuple[int, int]]:
+        records = await self.pool.fetch(build_query(OCCUPANCY, self.schema_name, "$1"), list(flight_ids))
+
+        return {record["flight_id"]: (record["number_of_passengers"], record["available_seating"]) for record in records}
+
+    async def reconcile_occupancy(self) -> int:
+        status = await self.pool.execute(build_query(RECONCILE_OCCUPANCY, self.schema_name))
+        corrected = int(status.split()[-1])
+        self.cache.invalidate("flight_data")
+
+        print(f'Reconciled the occupancy of {corrected} flights')
+
+        return corrected
+
+    async def __fill_rows(self, table: str, rows, keys: tuple[str] = ()) -> bool:
+        try:
+            await self.__ensure_keys((*SAMPLED_KEYS.get(table, ()), *keys))
+
+            # every fill draws from its own stream, concurrent fills never share a generator between threads
+            generator = self.generator.spawn()
+            await self.__write_rows(table, TABLE_COLUMNS[table], rows(generator, self.__sampler(generator)))
+        except Exception as e:
+            print(f"Failed to fill {table} table: {e}")
+
+            return False
+
+        return True
+
+    async def __seat_layout(self) -> tuple[list[str], list[str]]:
+        if self.seat_layout is None:
+            seat_classes = await self.pool.fetch(f"SELECT seat_number, seat_class FROM {self.schema_name}.seat_classes")
+            self.seat_layout = ([seat_number for seat_number, _ in seat_classes], [seat_class for _, seat_class in seat_classes])
+
+        return self.seat_layout
+
+    async def __held_rows(self, connection: asyncpg.Connection, name: str, query: str, itersize: int):
+        # declared outside any transaction, so the cursor outlives the commits and rollbacks of the writes on its connection
+        await connection.execute(f"DECLARE {name} NO SCROLL CURSOR WITH HOLD FOR {query}")
+        try:
+            while rows := await connection.fetch(f"FETCH {itersize} FROM {name}"):
+                for row in rows:
+                    yield tuple(row)
+        finally:
+            await connection.execute(f"CLOSE {name}")
+
+    async def __flight_ranges(self) -> list[tuple[int, int, int]]:
+        flight_ranges = await self.pool.fetch(build_query(FLIGHT_RANGES, self.schema_name, "$1"), self.__option("workers"))
+
+        return [tuple(flight_range) for flight_range in flight_ranges]
+
+    async def __flight_chunks(self, connection: asyncpg.Connection, low: int, high: int, chunk_flights: int):
+        last = low - 1
+        while True:
+            chunk = [row[0] for row in await connection.fetch(build_query(FLIGHT_CHUNK, self.schema_name, "$1", "$2", "$3"), last, high, chunk_flights)]
+            if not chunk:
+                return
+
+            last = chunk[-1]
+            yield chunk
+
+    async def __seat_inventories(self, connection: asyncpg.Connection, low: int, high: int, chunk_flights: int):
+        # one inventory per chunk of flights, only the seats of that chunk are ever held
+        seat_numbers, seat_classes = await self.__seat_layout()
+        seats = None
+
+        try:
+            if await connection.fetchval(build_query(RANGE_HAS_SEATS, self.schema_name, "$1", "$2"), low, high):
+                # DECLARE takes no parameters, the range is bound into the query here
+                seats = self.__held_rows(
+                    connection,
+                    f"held_seats_{low}",
+                    build_query(RANGE_SEATS, self.schema_name, str(int(low)), str(int(high))),
+                    self.batch_size
+                )
+
+            seat = await anext(seats, None) if seats is not None else None
+            async for chunk in self.__flight_chunks(connection, low, high, chunk_flights):
+                inventory = SeatInventory(seat_numbers, seat_classes)
+                while seat is not None and seat[0] <= chunk[-1]:
+                    inventory.load_seat(*seat)
+                    seat = await anext(seats, None)
+                inventory.compact()
+
+                missing = [flight_id for flight_id in chunk if flight_id not in inventory]
+                if missing and self.seats_pending:
+                    inventory.stage_flights(missing, await self.__reserve_ids(connection, "seats", len(missing) * inventory.seats_per_flight))
+
+                yield chunk, inventory
+        finally:
+            if seats is not None:
+                await seats.aclose()
+
+    async def get_interval_index(self, table: str) -> IntervalIndex:
+        if table not in self.interval_indexes:
+            index = IntervalIndex()
+            aircraft, start, end = WINDOW_COLUMNS[table]
+            async for rows in self.iter_table_content(
+                table,
+                columns=[aircraft, f"EXTRACT(EPOCH FROM {start})::bigint", f"EXTRACT(EPOCH FROM {end})::bigint"],
+                as_dicts=False,
+                itersize=self.batch_size
+            ):
+                index.add(*[np.array(column, dtype=np.int64) for column in zip(*rows)])
+
+            # a concurrent call may have loaded it in the meantime, the first one loaded wins
+            self.interval_indexes.setdefault(table, index)
+
+        return self.interval_indexes[table]
+
+    async def flush_seats(self) -> bool:
+        # flights the seats fill deferred and no bookings fill reached get their seats as 'Available'
+        async with self.seat_lock:
+            if not self.seats_pending:
+                return True
+
+            try:
+                await self.__book_flights(0)
+            except Exception as e:
+                print(f"Failed to write deferred seats: {e}")
+
+                return False
+
+        return True
+
+    async def __occupy(self, connection, seat_ids: list[int]) -> None:
+        await connection.execute(build_query(OCCUPY_SEATS, self.schema_name, "$1"), seat_ids)
+
+    async def occupy_seats(self, seat_ids: list[int], connection: asyncpg.Connection = None) -> bool:
+        try:
+            self.cache.invalidate("seats")
+            await self.__occupy(connection or self.pool, seat_ids)
+            self.cache.invalidate("seats")
+            self.cache.invalidate("flight_data")
+
+            print(f"Successfully updated {len(seat_ids)} seats to 'Occupied' status.")
+        except Exception as e:
+            print(f"Failed to update seat status: {e}")
+
+            return False
+
+        return True
+
+    async def __fill_airlines(self, fillings: int) -> bool:
+        return await self.__fill_rows("airlines", lambda generator, sample_keys: airline_rows(generator, fillings, self.batch_size))
+
+    async def __fill_customers(self, fillings: int) -> bool:
+        return await self.__fill_rows("customers", lambda generator, sample_keys: customer_rows(generator, fillings, self.batch_size))
+
+    async def __fill_reporteurs(self, fillings: int) -> bool:
+        return await self.__fill_rows("reporteurs", lambda generator, sample_keys: reporteur_rows(generator, fillings, self.batch_size))
+
+    async def __fill_aircrafts(self, fillings: int) -> bool:
+        return await self.__fill_rows("aircrafts", lambda generator, sample_keys: aircraft_rows(generator, fillings, self.batch_size))
+
+    async def __fill_airports(self, fillings: int) -> bool:
+        def rows(generator: BatchGenerator, sample_keys):
+            airport_ids = AIRPORT_CODES.sample(fillings, generator.rng, existing=self.key_registry.get("airports").tolist())
+
+            return airport_rows(generator, airport_ids, self.batch_size)
+
+        return await self.__fill_rows("airports", rows, keys=("airports",))
+
+    async def __fill_flights(self, fillings: int) -> bool:
+        def rows(generator: BatchGenerator, sample_keys):
+            flight_numbers = FLIGHT_NUMBERS.sample(fillings, generator.rng, existing=self.key_registry.get("flights").tolist())
+
+            return flight_rows(generator, sample_keys, flight_numbers, self.batch_size)
+
+        return await self.__fill_rows("flights", rows, keys=("flights",))
+
+    async def __fill_flight_data(self, fillings: int) -> bool:
+        def rows(generator: BatchGenerator, sample_keys):
+            flight_statuses = self.key_registry.get("flight_statuses")
+            problem_ids = self.key_registry.get("problems")
+
+            return flight_data_rows(generator, sample_keys, flight_statuses, problem_ids, fillings, self.batch_size)
+
+        return await self.__fill_rows("flight_data", rows)
+
+    async def __fill_maintenance_events(self, fillings: int) -> bool:
+        try:
+            index = await self.get_interval_index("maintenance_events")
+        except Exception as e:
+            print(f"Failed to fill maintenance_events table: {e}")
+
+            return False
+
+        return await self.__fill_rows("maintenance_events", lambda generator, sample_keys: maintenance_event_rows(generator, sample_keys, index, fillings, self.batch_size))
+
+    async def __fill_aircraft_slots(self, fillings: int) -> bool:
+        try:
+            index = await self.get_interval_index("aircraft_slots")
+        except Exception as e:
+            print(f"Failed to fill aircraft_slots table: {e}")
+
+            return False
+
+        return await self.__fill_rows("aircraft_slots", lambda generator, sample_keys: aircraft_slot_rows(generator, sample_keys, index, fillings, self.batch_size))
+
+    async def __fill_work_orders(self, fillings: int) -> bool:
+        return await self.__fill_rows("work_orders", lambda generator, sample_keys: work_order_rows(generator, sample_keys, fillings, self.batch_size))
+
+    async def __fill_seat_classes(self, fillings: int) -> bool:
+        return await self.__fill_rows("seat_classes", lambda generator, sample_keys: lookup_rows("seat_classes"))
+
+    async def __fill_subsystems(self, fillings: int) -> bool:
+        return await self.__fill_rows("subsystems", lambda generator, sample_keys: lookup_rows("subsystems"))
+
+    async def __fill_maintenance_types(self, fillings: int) -> bool:
+        return await self.__fill_rows("maintenance_types", lambda generator, sample_keys: lookup_rows("maintenance_types"))
+
+    async def __fill_flight_statuses(self, fillings: int) -> bool:
+        return await self.__fill_rows("flight_statuses", lambda generator, sample_keys: lookup_rows("flight_statuses"))
+
+    async def __fill_problems(self, fillings: int) -> bool:
+        return await self.__fill_rows("problems", lambda generator, sample_keys: lookup_rows("problems"))
+
+    async def __fill_seats(self, fillings: int) -> bool:
+        try:
+            if not (await self.__seat_layout())[0]:
+                raise LookupError("No seat classes, seat_classes has to be filled first")
+
+            async with self.seat_lock:
+                self.seats_pending = True
+                if self.defer_seats:
+                    # the bookings fill of the same run writes them, with the status they end up in
+                    flights = await self.pool.fetchval(build_query(UNSEATED_FLIGHTS, self.schema_name))
+                    print(f"Deferred the seats of {flights} flights to the bookings fill")
+
+                    return True
+
+                try:
+                    seats, _ = await self.__book_flights(0)
+                finally:
+                    # a failed fill is resumed by filling seats again, close does not retry it behind the caller's back
+                    self.seats_pending = False
+
+            print(f'Committed {seats} rows into seats')
+        except Exception as e:
+            print(f"An error occurred: {e}")
+
+            return False
+
+        return True
+
+    async def __write_bookings(self, connection: asyncpg.Connection, generator: BatchGenerator, chunks, fillings: int, position: int, flights: int) -> tuple[int, int]:
+        # the new seats of a chunk of flights commit with its bookings, a failed chunk leaves no seat occupied without a booking
+        sample_keys = self.__sampler(generator)
+        seated = booked = 0
+        # rows written since the last commit, the table policy commits them all at the end
+        pending = []
+        transaction = None
+
+        def committed() -> None:
+            self.__committed({"seats": sum(seats for seats, _ in pending), "bookings": sum(bookings for _, bookings in pending)})
+            # the passenger counters of flight_data moved with the seats, only dropped once the commit can be read
+            self.cache.invalidate("flight_data")
+            pending.clear()
+
+        try:
+            async with aclosing(chunks):
+                async for flight_ids, inventory in chunks:
+                    # bookings spread evenly over the flights, the chunks of every partition add up to fillings
+                    count = fillings * (position + len(flight_ids)) // flights - fillings * position // flights
+                    position += len(flight_ids)
+
+                    # flights without seats can not be booked
+                    flight_ids = [flight_id for flight_id in flight_ids if flight_id in inventory]
+                    if not flight_ids:
+                        continue
+
+                    # the table policy's transaction only starts once the chunks have declared their cursor
+                    if transaction is None and self.__option("commit_policy") == "table":
+                        transaction = connection.transaction()
+                        await transaction.start()
+
+                    seats, bookings, occupied = await asyncio.to_thread(
+                        book_chunk, inventory, flight_ids, count, generator, sample_keys, self.batch_size
+                    )
+                    seated += len(seats)
+                    booked += len(bookings)
+
+                    groups = booking_groups(seats, bookings, occupied) if self.__option("commit_policy") == "row" else [(seats, bookings, occupied)]
+                    for seats, bookings, occupied in groups:
+                        pending.append((len(seats), len(bookings)))
+
+                        async with connection.transaction() if transaction is None else nullcontext():
+                            if seats:
+                                await self.__write_batch(connection, "seats", SEAT_COLUMNS, seats)
+                            if bookings:
+                                await self.__write_batch(connection, "bookings", TABLE_COLUMNS["bookings"], bookings)
+                            if occupied:
+                                await self.__occupy(connection, occupied)
+
+                        if transaction is None:
+                            committed()
+
+                if transaction is not None:
+                    await transaction.commit()
+                    committed()
+        except BaseException:
+            if transaction is not None:
+                await transaction.rollback()
+
+            raise
+
+        return seated, booked
+
+    async def __book_flights(self, fillings: int) -> tuple[int, int]:
+        # every worker walks its own range of flights, one chunk at a time
+        flight_ranges = await self.__flight_ranges()
+        flights = sum(count for *_, count in flight_ranges)
+        positions = np.cumsum([0, *[count for *_, count in flight_ranges]]).tolist()
+        # a chunk's new seats fill about one batch, its bookings never take more
+        chunk_flights = max(1, self.batch_size // max(1, len((await self.__seat_layout())[0])))
+
+        async def partition(generator: BatchGenerator, low: int, high: int, position: int) -> tuple[int, int]:
+            async with self.pool.acquire() as connection:
+                return await self.__write_bookings(connection, generator, self.__seat_inventories(connection, low, high, chunk_flights), fillings, position, flights)
+
+        results = await asyncio.gather(*[
+            partition(self.generator.spawn(), low, high, position)
+            for (low, high, _), position in zip(flight_ranges, positions)
+        ], return_exceptions=True)
+        # every partition has stopped before the seat lock is released, the first failure is raised then
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        # every flight has its seats now
+        self.seats_pending = False
+
+        return sum(seats for seats, _ in results), sum(bookings for _, bookings in results)
+
+    async def __fill_bookings(self, fillings: int) -> bool:
+        try:
+            await self.__ensure_keys(SAMPLED_KEYS["bookings"])
+
+            async with self.seat_lock:
+                if not self.seats_pending and not await self.pool.fetchval(f"SELECT EXISTS (SELECT 1 FROM {self.schema_name}.seats)"):
+                    raise LookupError("No seats to book, seats have to be filled first")
+
+                seats, booked = await self.__book_flights(fillings)
+
+            if seats:
+                print(f'Committed {seats} rows into seats')
+            print(f'Committed {booked} rows into bookings')
+        except Exception as e:
+            print(f"Failed to fill bookings table: {e}")
+
+            return False
+
+        return True
+
+    async def fill_table(self, table: str, fillings: int = 100, load_method: str = None, commit_policy: str = None, workers: int = None, pipeline_depth: int = None) -> bool:
+        options = {}
+        if load_method is not None:
+            if load_method not in LOAD_METHODS:
+                raise ValueError(f'Unknown load method {load_method}, expected one of {LOAD_METHODS}')
+            options["load_method"] = load_method
+        if commit_policy is not None:
+            if commit_policy not in COMMIT_POLICIES:
+                raise ValueError(f'Unknown commit policy {commit_policy}, expected one of {COMMIT_POLICIES}')
+            options["commit_policy"] = commit_policy
+        if workers is not None:
+            if not 1 <= workers <= self.pool_size:
+                raise ValueError(f'workers must be between 1 and pool_size ({self.pool_size})')
+            options["workers"] = workers
+        if pipeline_depth is not None:
+            if pipeline_depth < 0:
+                raise ValueError('pipeline_depth can not be negative')
+            options["pipeline_depth"] = pipeline_depth
+
+        start = time.perf_counter()
+        token = self.fill_options.set(options)
+        try:
+            # deferred seats wait for the bookings fill, a concurrent fill of another table never writes them as 'Available'
+            fill = await self.filling_mapper[table](fillings)
+        finally:
+            self.fill_options.reset(token)
+
+        if self.instrumentation is not None:
+            # concurrent fills share the connections, so their database time can not be told apart
+            self.instrumentation.record("fill_table", time.perf_counter() - start, table=table, ok=fill, fill_seconds=time.perf_counter() - start)
+
+        if fill:
+            print(f'Successfully filled {table} with {fillings}')
+        else:
+            print(f'Can not fill {table}')
+
+        return fill
+
+    async def fill_tables(self, tables: list[str] = None, fillings: int | dict[str, int] = 100, workers: int = None, scale_factor: float = None) -> dict[str, bool]:
+        tables = list(self.filling_mapper) if tables is None else tables
+        dependencies = build_dependency_graph(tables, await self.get_foreign_keys())
+
+        if scale_factor is not None:
+            fillings = scale_fillings(scale_factor, {"airports": AIRPORT_CODES.size, "flights": FLIGHT_NUMBERS.size})
+        if not isinstance(fillings, dict):
+            fillings = {table: fillings for table in tables}
+
+        # a table starts as soon as the tables it references are filled, at most workers of them at a time
+        slots = asyncio.Semaphore(workers or self.pool_size)
+
+        async def fill(table: str) -> bool:
+            async with slots:
+                return await self.fill_table(table, fillings[table])
+
+        # seats of a run that also books them are written once, by the bookings fill
+        default_defer_seats, self.defer_seats = self.defer_seats, "bookings" in tables
+        try:
+            pending = {table: set(references) for table, references in dependencies.items()}
+            running = {}
+            results = {}
+
+            while pending or running:
+                ready = [table for table, references in pending.items() if references <= results.keys()]
+                for table in ready:
+                    references = pending.pop(table)
+                    failed = [reference for reference in references if not results[reference]]
+                    if failed:
+                        print(f'Skipping {table}, dependencies failed: {", ".join(sorted(failed))}')
+                        results[table] = False
+                    else:
+                        running[asyncio.create_task(fill(table))] = table
+
+                if ready and not running:
+                    continue
+
+                if not running:
+                    raise ValueError(f'Foreign key cycle between {", ".join(sorted(pending))}')
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    table = running.pop(task)
+                    try:
+                        results[table] = task.result()
+                    except Exception as e:
+                        print(f'Filling {table} failed: {e}')
+                        results[table] = False
+
+            # a bookings fill that failed or was skipped leaves the seats to write here
+            if self.seats_pending and not await self.flush_seats():
+                results["seats"] = False
+        finally:
+            self.defer_seats = default_defer_seats
+
+        return results
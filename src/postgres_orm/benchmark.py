@@ -0,0 +1,224 @@
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+from postgres_orm.instrumentation import Instrumentation
+from postgres_orm.scale import scale_fillings
+
+# run in a fresh interpreter, so nothing imported or cached by the caller hides the startup cost
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from postgres_orm import PostgresORM
+imported = time.perf_counter()
+orm = PostgresORM(**json.loads(sys.argv[1]))
+constructed = time.perf_counter()
+rows = len(orm.get_table_content(sys.argv[2])) if sys.argv[2] else 0
+read = time.perf_counter()
+orm.close()
+print(json.dumps({"import_seconds": imported - start, "construct_seconds": constructed - imported, "first_read_seconds": read - constructed, "rows": rows}))
+"""
+
+
+def reset_peak_rss() -> bool:
+    # writing 5 to clear_refs resets VmHWM on Linux, elsewhere the peak only grows
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+
+    return True
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    return usage.ru_utime + usage.ru_stime
+
+
+def truncate_tables(orm, tables) -> None:
+    orm.cursor.execute(f'TRUNCATE {", ".join(f"{orm.schema_name}.{table}" for table in tables)} RESTART IDENTITY CASCADE')
+    orm.connection.commit()
+
+
+def count_rows(orm, tables) -> int:
+    orm.cursor.execute(" UNION ALL ".join(f'(SELECT 1 FROM {orm.schema_name}.{table} LIMIT 1)' for table in tables))
+
+    return len(orm.cursor.fetchall())
+
+
+def benchmark_worker(connection_params: dict, tables: list[str], scale_factor: float, truncate: bool) -> dict:
+    from postgres_orm import PostgresORM
+
+    instrumentation = Instrumentation()
+    orm = PostgresORM(**connection_params, instrumentation=instrumentation)
+    orm.defer_seats = "bookings" in tables
+    try:
+        if truncate:
+            truncate_tables(orm, tables)
+        elif count_rows(orm, tables):
+            raise RuntimeError(f'{orm.schema_name} already has rows, benchmark runs need empty tables or truncate=True')
+
+        fillings = scale_fillings(scale_factor)
+        results = []
+
+        for table in tables:
+            committed_rows = dict(orm.committed_rows)
+            commit_count = orm.commit_count
+            round_trips, db_seconds = instrumentation.round_trips, instrumentation.db_seconds
+            reset_peak_rss()
+            cpu = cpu_seconds()
+            start = time.perf_counter()
+
+            ok = orm.fill_table(table, fillings[table])
+
+            seconds = time.perf_counter() - start
+            # deferred seats are committed by the bookings fill, so rows are counted for every table the call wrote
+            written = {name: rows - committed_rows.get(name, 0) for name, rows in orm.committed_rows.items() if rows != committed_rows.get(name, 0)}
+            rows = sum(written.values())
+
+            results.append({
+                "table": table,
+                "ok": ok,
+                "fillings": fillings[table],
+                "rows": rows,
+                "written": written,
+                "seconds": round(seconds, 6),
+                "rows_per_second": round(rows / seconds, 1) if seconds else None,
+                "round_trips": instrumentation.round_trips - round_trips,
+                "commits": orm.commit_count - commit_count,
+                "db_seconds": round(instrumentation.db_seconds - db_seconds, 6),
+                "cpu_seconds": round(cpu_seconds() - cpu, 6),
+                "peak_rss_mb": round(peak_rss_mb(), 1)
+            })
+
+        return {
+            "load_method": connection_params.get("load_method", "insert"),
+            "commit_policy": connection_params.get("commit_policy", "batch"),
+            "scale_factor": scale_factor,
+            "tables": results,
+            "rows": sum(result["rows"] for result in results),
+            "seconds": round(sum(result["seconds"] for result in results), 6),
+            "round_trips": sum(result["round_trips"] for result in results),
+            "db_seconds": round(sum(result["db_seconds"] for result in results), 6),
+            "commits": sum(result["commits"] for result in results),
+            "cpu_seconds": round(sum(result["cpu_seconds"] for result in results), 6),
+            "peak_rss_mb": max(result["peak_rss_mb"] for result in results),
+            "statements": instrumentation.snapshot()["statements"]
+        }
+    finally:
+        orm.close()
+
+
+def run_benchmark(connection_params: dict, tables: list[str], scale_factors: list[float], strategies: list[dict], truncate: bool = False) -> dict:
+    runs = []
+
+    for strategy in strategies:
+        for scale_factor in scale_factors:
+            print(f'Benchmarking {strategy} at scale factor {scale_factor}')
+
+            # every run gets a fresh process, so peak memory and caches of one run never leak into the next
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                run = executor.submit(benchmark_worker, {**connection_params, **strategy}, list(tables), scale_factor, truncate).result()
+
+            run["rows_per_second"] = round(run["rows"] / run["seconds"], 1) if run["seconds"] else None
+            runs.append(run)
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "tables": list(tables),
+        "runs": runs
+    }
+
+
+def measure_startup(connection_params: dict, table: str = None, runs: int = 5) -> dict:
+    # the directory holding the package, so the child imports this copy of it
+    path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, (path, os.environ.get("PYTHONPATH"))))}
+    samples = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, json.dumps(connection_params), table or ""],
+            capture_output=True, text=True, check=True, env=env
+        ).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample["process_seconds"] = time.perf_counter() - start
+        samples.append(sample)
+
+    return {
+        "table": table,
+        "runs": runs,
+        **{
+            name: round(statistics.median(sample[name] for sample in samples), 6)
+            for name in ("import_seconds", "construct_seconds", "first_read_seconds", "process_seconds")
+        }
+    }
+
+
+def save_results(results: dict, path: str) -> None:
+    with open(path, "w") as file:
+        json.dump(results, file, indent=4)
+
+
+def load_results(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare_results(baseline: dict, current: dict, tolerance: float = 0.1, min_rows: int = 1000) -> list[str]:
+    def key(run: dict) -> tuple:
+        return run["load_method"], run["commit_policy"], run["scale_factor"]
+
+    baseline_runs = {key(run): run for run in baseline["runs"]}
+    regressions = []
+
+    for run in current["runs"]:
+        previous = baseline_runs.get(key(run))
+        if previous is None:
+            continue
+
+        previous_tables = {result["table"]: result for result in previous["tables"]}
+        for result in run["tables"]:
+            before = previous_tables.get(result["table"])
+            # a handful of lookup rows takes milliseconds, too little to compare
+            if before is None or before["rows"] < min_rows or not before["rows_per_second"] or result["rows_per_second"] is None:
+                continue
+
+            if result["rows_per_second"] < before["rows_per_second"] * (1 - tolerance):
+                regressions.append(
+                    f'{result["table"]} ({run["load_method"]}, {run["commit_policy"]}, SF {run["scale_factor"]}): '
+                    f'{before["rows_per_second"]} -> {result["rows_per_second"]} rows/s'
+                )
+            if result["round_trips"] > before["round_trips"] * (1 + tolerance):
+                regressions.append(
+                    f'{result["table"]} ({run["load_method"]}, {run["commit_policy"]}, SF {run["scale_factor"]}): '
+                    f'{before["round_trips"]} -> {result["round_trips"]} round trips'
+                )
+
+    return regressions
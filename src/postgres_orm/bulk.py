@@ -0,0 +1,114 @@
+import re
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from queue import Empty, Full, Queue
+from threading import Event, Thread
+
+
+COPY_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "\t": "\\t",
+    "\n": "\\n",
+    "\r": "\\r"
+})
+COPY_SPECIALS = re.compile(r"[\\\t\n\r]")
+
+
+def format_copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, str):
+        # most values have nothing to escape, a search is much cheaper than translate
+        return value.translate(COPY_ESCAPES) if COPY_SPECIALS.search(value) else value
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return f"{value.days} days {value.seconds} seconds {value.microseconds} microseconds"
+
+    return str(value)
+
+
+def encode_copy_rows(rows: list[tuple]) -> list[str]:
+    return ["\t".join([format_copy_value(value) for value in row]) for row in rows]
+
+
+def build_copy_buffer(rows: list[tuple], lines: list[str] = None, keys: list = None) -> StringIO:
+    lines = encode_copy_rows(rows) if lines is None else lines
+
+    # keys, when given, become the last column of every line
+    if keys is None:
+        buffer = StringIO("\n".join(lines) + "\n")
+    else:
+        buffer = StringIO("".join([f"{line}\t{key}\n" for line, key in zip(lines, keys)]))
+
+    return buffer
+
+
+def chunked(rows, size: int):
+    chunk = []
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+PREFETCH_DONE = object()
+
+
+def prefetch(items, depth: int):
+    # a producer thread runs ahead of the consumer by at most depth items, then blocks until one is taken
+    queue = Queue(maxsize=depth)
+    stopped = Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+
+                return True
+            except Full:
+                continue
+
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((PREFETCH_DONE, None))
+        except BaseException as e:
+            put((PREFETCH_DONE, e))
+
+    producer = Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item, error = queue.get()
+            if error is not None:
+                raise error
+            if item is PREFETCH_DONE:
+                return
+
+            yield item
+    finally:
+        stopped.set()
+        # unblock a producer waiting on a full queue, then let it finish its current item
+        try:
+            while True:
+                queue.get_nowait()
+        except Empty:
+            pass
+        producer.join()
@@ -0,0 +1,70 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class TableCache:
+    def __init__(self, max_entries: int = 128, max_rows: int = 100_000):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+
+        # (table, projection) -> (rows, value), least recently used first
+        self.entries = OrderedDict()
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return key in self.entries
+
+    def get(self, table: str, projection: str):
+        with self.lock:
+            entry = self.entries.get((table, projection))
+            if entry is None:
+                self.misses += 1
+
+                return None
+
+            self.entries.move_to_end((table, projection))
+            self.hits += 1
+
+            return entry[1]
+
+    def put(self, table: str, projection: str, value, rows: int) -> None:
+        # a table too big for the whole cache would only evict everything else
+        if rows > self.max_rows or not self.max_entries:
+            return
+
+        with self.lock:
+            previous = self.entries.pop((table, projection), None)
+            if previous is not None:
+                self.rows -= previous[0]
+
+            self.entries[(table, projection)] = (rows, value)
+            self.rows += rows
+
+            while len(self.entries) > self.max_entries or self.rows > self.max_rows:
+                evicted_rows, _ = self.entries.popitem(last=False)[1]
+                self.rows -= evicted_rows
+
+    def invalidate(self, table: str) -> None:
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == table]:
+                self.rows -= self.entries.pop(key)[0]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.rows = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "rows": self.rows,
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,48 @@
+from collections import deque
+from datetime import date
+from threading import Lock
+
+
+# batch index of the row that marks a whole table as filled
+COMPLETE_BATCH = -1
+
+
+class FillCheckpoint:
+    def __init__(self, table: str, seed: int, fillings: int, batch_size: int, batches: dict[int, int] = None, complete: bool = False, started_on: date = None):
+        self.table = table
+        self.seed = seed
+        self.fillings = fillings
+        self.batch_size = batch_size
+        # rows of every committed batch by its index
+        self.batches = batches or {}
+        self.complete = complete
+        # a resumed fill generates dates relative to the day of the first run
+        self.started_on = started_on or date.today()
+
+        # indexes of the batches handed to the writer, in the order their rows arrive there
+        self.started = deque()
+        self.next_index = max(self.batches, default=-1) + 1
+        self.lock = Lock()
+
+    @property
+    def rows(self) -> int:
+        return sum(self.batches.values())
+
+    def start(self, index: int) -> None:
+        self.started.append(index)
+
+    def next_batch(self) -> int:
+        # rows that do not come from generator.blocks get the next free index instead
+        with self.lock:
+            if self.started:
+                return self.started.popleft()
+
+            index = self.next_index
+            self.next_index += 1
+
+            return index
+
+    def commit(self, index: int, rows: int) -> None:
+        with self.lock:
+            self.batches[index] = rows
+            self.next_index = max(self.next_index, index + 1)
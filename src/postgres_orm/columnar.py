@@ -0,0 +1,87 @@
+import numpy as np
+
+
+# how each information_schema data_type is selected so that psycopg2 hands back plain ints and floats
+COLUMN_EXPRESSIONS = {
+    "date": "({column} - DATE '1970-01-01')",
+    "timestamp without time zone": "(EXTRACT(EPOCH FROM {column}) * 1000000)::bigint",
+    "time without time zone": "(EXTRACT(EPOCH FROM {column}) * 1000000)::bigint",
+    "interval": "(EXTRACT(EPOCH FROM {column}) * 1000000)::bigint",
+    "numeric": "{column}::float8"
+}
+
+COLUMN_DTYPES = {
+    "smallint": np.int16,
+    "integer": np.int32,
+    "bigint": np.int64,
+    "real": np.float32,
+    "double precision": np.float64,
+    "numeric": np.float64,
+    "boolean": np.bool_,
+    "date": np.int32,
+    "timestamp without time zone": np.int64,
+    "time without time zone": np.int64,
+    "interval": np.int64
+}
+
+COLUMN_VIEWS = {
+    "date": "datetime64[D]",
+    "timestamp without time zone": "datetime64[us]",
+    "time without time zone": "timedelta64[us]",
+    "interval": "timedelta64[us]"
+}
+
+
+class DictionaryColumn:
+    def __init__(self, codes: np.ndarray, values: list):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __repr__(self) -> str:
+        return f'DictionaryColumn(rows={len(self.codes)}, values={len(self.values)})'
+
+    def decode(self) -> np.ndarray:
+        return np.array(self.values, dtype=object)[self.codes]
+
+
+class ColumnBuilder:
+    def __init__(self, name: str, data_type: str):
+        self.name = name
+        self.data_type = data_type
+        self.chunks = []
+
+        self.dictionary = {} if data_type not in COLUMN_DTYPES else None
+
+    def select_expression(self) -> str:
+        return COLUMN_EXPRESSIONS.get(self.data_type, "{column}").format(column=self.name)
+
+    def append(self, values: list) -> None:
+        if self.dictionary is not None:
+            dictionary = self.dictionary
+            self.chunks.append(np.fromiter(
+                (dictionary.setdefault(value, len(dictionary)) for value in values),
+                dtype=np.int32,
+                count=len(values)
+            ))
+
+            return
+
+        if None in values:
+            raise ValueError(f'Column {self.name} contains NULL values, which have no {self.data_type} representation')
+
+        self.chunks.append(np.array(values, dtype=COLUMN_DTYPES[self.data_type]))
+
+    def build(self):
+        if self.dictionary is not None:
+            codes = np.concatenate(self.chunks) if self.chunks else np.empty(0, dtype=np.int32)
+
+            return DictionaryColumn(codes, list(self.dictionary))
+
+        column = np.concatenate(self.chunks) if self.chunks else np.empty(0, dtype=COLUMN_DTYPES[self.data_type])
+        if self.data_type in COLUMN_VIEWS:
+            column = column.astype(np.int64).view(COLUMN_VIEWS[self.data_type])
+
+        return column
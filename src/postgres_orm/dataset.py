@@ -0,0 +1,239 @@
+import json
+import mmap
+import os
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from struct import Struct
+from threading import Lock
+
+from postgres_orm.bulk import format_copy_value
+
+
+FILE_FORMATS = {
+    "csv": ".csv",
+    "binary": ".bin"
+}
+MANIFEST_NAME = "manifest.json"
+
+BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + Struct(">ii").pack(0, 0)
+BINARY_TRAILER = Struct(">h").pack(-1)
+
+# binary COPY counts dates and timestamps from 2000-01-01
+POSTGRES_EPOCH = datetime(2000, 1, 1)
+
+INT16 = Struct(">h")
+INT32 = Struct(">i")
+INT64 = Struct(">q")
+FLOAT32 = Struct(">f")
+FLOAT64 = Struct(">d")
+INTERVAL = Struct(">qii")
+NUMERIC_HEADER = Struct(">hhhh")
+
+
+def encode_numeric(value) -> bytes:
+    value = value if isinstance(value, Decimal) else Decimal(str(value))
+    integer, _, fraction = format(abs(value), "f").partition(".")
+
+    integer = integer.lstrip("0")
+    integer = integer.zfill(-(-len(integer) // 4) * 4)
+    padded_fraction = fraction.ljust(-(-len(fraction) // 4) * 4, "0")
+
+    # numeric is stored as base 10000 digits, weight is the power of the first one
+    digits = [int(integer[i:i + 4]) for i in range(0, len(integer), 4)]
+    weight = len(digits) - 1
+    digits += [int(padded_fraction[i:i + 4]) for i in range(0, len(padded_fraction), 4)]
+
+    while digits and digits[0] == 0:
+        digits.pop(0)
+        weight -= 1
+    while digits and digits[-1] == 0:
+        digits.pop()
+
+    sign = 0x4000 if value < 0 else 0x0000
+
+    return NUMERIC_HEADER.pack(len(digits), weight if digits else 0, sign, len(fraction)) + b"".join(INT16.pack(digit) for digit in digits)
+
+
+def encode_timestamp(value: date) -> bytes:
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+
+    return INT64.pack((value - POSTGRES_EPOCH) // timedelta(microseconds=1))
+
+
+def encode_interval(value: timedelta) -> bytes:
+    return INTERVAL.pack(value.seconds * 1_000_000 + value.microseconds, value.days, 0)
+
+
+BINARY_ENCODERS = {
+    "smallint": INT16.pack,
+    "integer": INT32.pack,
+    "bigint": INT64.pack,
+    "real": FLOAT32.pack,
+    "double precision": FLOAT64.pack,
+    "numeric": encode_numeric,
+    "boolean": lambda value: b"\x01" if value else b"\x00",
+    "date": lambda value: INT32.pack((value - POSTGRES_EPOCH.date()).days),
+    "timestamp without time zone": encode_timestamp,
+    "time without time zone": lambda value: INT64.pack(((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond),
+    "interval": encode_interval
+}
+
+
+def encode_text(value) -> bytes:
+    return str(value).encode("utf-8")
+
+
+def format_csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        # quoted values are never read back as NULL, not even the empty string
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, (date, timedelta)) or value is True or value is False:
+        return format_copy_value(value)
+
+    return str(value)
+
+
+class DatasetWriter:
+    def __init__(self, directory: str, schema_name: str, column_types: dict[str, dict[str, str]], primary_keys: dict[str, str], file_format: str = "binary"):
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f'Unknown file format {file_format}, expected one of {tuple(FILE_FORMATS)}')
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.schema_name = schema_name
+        self.column_types = column_types
+        self.primary_keys = primary_keys
+        self.file_format = file_format
+
+        self.files = {}
+        self.tables = {}
+        self.next_ids = {}
+        self.lock = Lock()
+
+    def reserve_ids(self, table: str, count: int) -> list[int]:
+        with self.lock:
+            start = self.next_ids.get(table, 1)
+            self.next_ids[table] = start + count
+
+        return list(range(start, start + count))
+
+    def __encode(self, table: str, columns: tuple[str], rows: list[tuple]) -> bytes:
+        if self.file_format == "csv":
+            return "".join(",".join([format_csv_value(value) for value in row]) + "\n" for row in rows).encode("utf-8")
+
+        encoders = [BINARY_ENCODERS.get(self.column_types[table][column], encode_text) for column in columns]
+        field_count = INT16.pack(len(columns))
+        chunks = []
+
+        for row in rows:
+            chunks.append(field_count)
+            for encode, value in zip(encoders, row):
+                if value is None:
+                    chunks.append(INT32.pack(-1))
+                    continue
+
+                field = encode(value)
+                chunks.append(INT32.pack(len(field)))
+                chunks.append(field)
+
+        return b"".join(chunks)
+
+    def write(self, table: str, columns: tuple[str], rows: list[tuple]) -> None:
+        data = self.__encode(table, columns, rows)
+
+        with self.lock:
+            if table not in self.files:
+                self.files[table] = open(os.path.join(self.directory, table + FILE_FORMATS[self.file_format]), "wb")
+                self.tables[table] = {"columns": list(columns), "rows": 0}
+                if self.file_format == "binary":
+                    self.files[table].write(BINARY_HEADER)
+            elif self.tables[table]["columns"] != list(columns):
+                raise ValueError(f'Rows of {table} were written with columns {self.tables[table]["columns"]}, not {list(columns)}')
+
+            self.files[table].write(data)
+            self.tables[table]["rows"] += len(rows)
+
+    def close(self) -> dict:
+        tables = []
+
+        with self.lock:
+            for table, file in self.files.items():
+                if self.file_format == "binary":
+                    file.write(BINARY_TRAILER)
+                file.close()
+
+                primary_key = self.primary_keys.get(table)
+                tables.append({
+                    "table": table,
+                    "file": os.path.basename(file.name),
+                    "columns": self.tables[table]["columns"],
+                    "rows": self.tables[table]["rows"],
+                    "bytes": os.path.getsize(file.name),
+                    "primary_key": primary_key,
+                    "serial": table in self.next_ids
+                })
+
+            self.files = {}
+
+        manifest = {
+            "schema_name": self.schema_name,
+            "format": self.file_format,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            # tables are listed in the order they were first written, which respects the foreign keys
+            "tables": tables
+        }
+
+        with open(os.path.join(self.directory, MANIFEST_NAME), "w") as file:
+            json.dump(manifest, file, indent=4)
+
+        return manifest
+
+
+def read_manifest(directory: str) -> dict:
+    with open(os.path.join(directory, MANIFEST_NAME)) as file:
+        return json.load(file)
+
+
+def load_dataset(connection, schema_name: str, directory: str, tables: list[str] = None) -> dict[str, int]:
+    manifest = read_manifest(directory)
+    options = "FORMAT binary" if manifest["format"] == "binary" else "FORMAT csv"
+    loaded = {}
+
+    cursor = connection.cursor()
+    try:
+        for entry in manifest["tables"]:
+            table = entry["table"]
+            if tables is not None and table not in tables:
+                continue
+
+            path = os.path.join(directory, entry["file"])
+            if os.path.getsize(path) != entry["bytes"]:
+                raise ValueError(f'{path} has {os.path.getsize(path)} bytes, the manifest expects {entry["bytes"]}')
+
+            with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # the mapping is read straight into the COPY stream, the file is never copied into Python memory as a whole
+                cursor.copy_expert(f'COPY {schema_name}.{table} ({", ".join(entry["columns"])}) FROM STDIN WITH ({options})', data, size=1 << 20)
+
+            loaded[table] = cursor.rowcount
+
+            if entry["serial"]:
+                cursor.execute(
+                    f'SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({entry["primary_key"]}), 1), MAX({entry["primary_key"]}) IS NOT NULL) FROM {schema_name}.{table}',
+                    (f'{schema_name}.{table}', entry["primary_key"])
+                )
+
+            connection.commit()
+
+            print(f'Loaded {loaded[table]} rows into {table} from {entry["file"]}')
+    except Exception:
+        connection.rollback()
+
+        raise
+    finally:
+        cursor.close()
+
+    return loaded
@@ -0,0 +1,157 @@
+import gzip
+import os
+from threading import Thread
+
+
+EXPORT_FORMATS = {
+    "csv": ".csv",
+    "parquet": ".parquet"
+}
+CSV_COMPRESSIONS = {
+    "none": "",
+    "gzip": ".gz"
+}
+# Parquet takes every codec of pyarrow, "none" included
+DEFAULT_COMPRESSIONS = {
+    "csv": "gzip",
+    "parquet": "zstd"
+}
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def export_path(directory: str, table: str, file_format: str, compression: str = None) -> str:
+    compression = compression or DEFAULT_COMPRESSIONS[file_format]
+    suffix = EXPORT_FORMATS[file_format] + (CSV_COMPRESSIONS[compression] if file_format == "csv" else "")
+
+    return os.path.join(directory, f'{table}{suffix}')
+
+
+def copy_to_csv(cursor, query: str, path: str, compression: str = "gzip", compresslevel: int = 6) -> int:
+    if compression not in CSV_COMPRESSIONS:
+        raise ValueError(f'Unknown CSV compression {compression}, expected one of {tuple(CSV_COMPRESSIONS)}')
+
+    # the server formats the rows, the bytes go from the socket into the file without becoming Python rows
+    with (gzip.open(path, "wb", compresslevel=compresslevel) if compression == "gzip" else open(path, "wb")) as file:
+        cursor.copy_expert(f'COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)', file, size=COPY_CHUNK_SIZE)
+
+    return cursor.rowcount
+
+
+def arrow_columns(column_types: dict[str, str], numeric_precisions: dict[str, tuple[int, int]]) -> tuple[list[str], object]:
+    import pyarrow as pa
+
+    expressions, fields = [], []
+    for column, data_type in column_types.items():
+        expression = column
+
+        if data_type == "integer":
+            arrow_type = pa.int32()
+        elif data_type == "bigint":
+            arrow_type = pa.int64()
+        elif data_type == "smallint":
+            arrow_type = pa.int16()
+        elif data_type == "double precision":
+            arrow_type = pa.float64()
+        elif data_type == "real":
+            arrow_type = pa.float32()
+        elif data_type == "numeric" and numeric_precisions.get(column, (None, None))[0] is not None:
+            arrow_type = pa.decimal128(*numeric_precisions[column])
+        elif data_type == "boolean":
+            arrow_type = pa.bool_()
+        elif data_type == "date":
+            arrow_type = pa.date32()
+        elif data_type == "timestamp without time zone":
+            arrow_type = pa.timestamp("us")
+        elif data_type == "timestamp with time zone":
+            arrow_type = pa.timestamp("us", tz="UTC")
+            expression = f"{column} AT TIME ZONE 'UTC' AS {column}"
+        elif data_type == "time without time zone":
+            arrow_type = pa.time64("us")
+        elif data_type == "interval":
+            # Arrow has no interval the CSV reader parses, the server sends microseconds for a duration instead
+            arrow_type = pa.duration("us")
+            expression = f"(EXTRACT(EPOCH FROM {column}) * 1000000)::bigint AS {column}"
+        else:
+            # text, unconstrained numeric and everything else stay strings, nothing is lost on the way
+            arrow_type = pa.string()
+
+        expressions.append(expression)
+        fields.append(pa.field(column, arrow_type))
+
+    return expressions, pa.schema(fields)
+
+
+def copy_to_parquet(cursor, query: str, path: str, schema, row_group_size: int = 1_000_000, compression: str = "zstd") -> int:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    # COPY writes into one end of a pipe from a thread, Arrow's CSV reader parses the other end in blocks
+    read_fd, write_fd = os.pipe()
+    reader_file, writer_file = os.fdopen(read_fd, "rb"), os.fdopen(write_fd, "wb")
+    failures = []
+
+    def produce():
+        try:
+            cursor.copy_expert(f'COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)', writer_file, size=COPY_CHUNK_SIZE)
+        except BaseException as e:
+            failures.append(e)
+        finally:
+            writer_file.close()
+
+    producer = Thread(target=produce, daemon=True)
+    producer.start()
+
+    rows = 0
+    try:
+        batches = pa_csv.open_csv(
+            reader_file,
+            read_options=pa_csv.ReadOptions(block_size=16 << 20),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=schema,
+                true_values=["t"],
+                false_values=["f"],
+                # an unquoted empty field is NULL in PostgreSQL's CSV, a quoted one an empty string
+                # and text such as NA or null stays text, unlike pyarrow's default null markers
+                null_values=[""],
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=False
+            )
+        )
+
+        with pq.ParquetWriter(path, schema, compression=compression) as writer:
+            pending, pending_rows = [], 0
+            for batch in batches:
+                pending.append(batch)
+                pending_rows += batch.num_rows
+
+                # the reader's blocks are small, only full row groups are written until the last one
+                if pending_rows >= row_group_size:
+                    table = pa.Table.from_batches(pending, schema)
+                    full = pending_rows - pending_rows % row_group_size
+                    writer.write_table(table.slice(0, full), row_group_size=row_group_size)
+                    rows += full
+                    pending, pending_rows = table.slice(full).to_batches(), pending_rows - full
+
+            if pending:
+                writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=row_group_size)
+                rows += pending_rows
+    except BaseException:
+        # a failed COPY ends the stream itself, otherwise the server is stopped so the producer's blocked write ends
+        cancelled = producer.is_alive()
+        if cancelled:
+            cursor.connection.cancel()
+        reader_file.close()
+        producer.join()
+
+        if failures and not cancelled:
+            raise failures[0]
+
+        raise
+
+    reader_file.close()
+    producer.join()
+    if failures:
+        raise failures[0]
+
+    return rows
@@ -0,0 +1,171 @@
+import zlib
+from datetime import date, datetime, time, timedelta
+from functools import cache
+from threading import Lock
+
+import numpy as np
+
+from postgres_orm.checkpoint import FillCheckpoint
+
+
+SECONDS_IN_DAY = 24 * 60 * 60
+
+
+def create_faker():
+    # importing faker loads every locale provider, only a process that needs fake strings pays for it
+    from faker import Faker
+
+    return Faker()
+
+
+@cache
+def shared_faker():
+    return create_faker()
+
+
+class BatchGenerator:
+    def __init__(self, faker=None, seed: int = None, vocabulary_size: int = 1000):
+        # None uses the faker shared by the process, created on the first fake string
+        self.__faker = faker
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.vocabulary_size = vocabulary_size
+
+        self.vocabularies = {}
+        self.vocabulary_lock = Lock()
+        self.times_of_day = None
+
+        # set by for_table, blocks then reseed rng for every batch and dates are relative to the day the fill started
+        self.table_seed = None
+        self.checkpoint = None
+        self.reference_date = None
+
+    def spawn(self) -> "BatchGenerator":
+        generator = BatchGenerator(self.__faker, self.seed, vocabulary_size=self.vocabulary_size)
+        generator.rng = self.rng.spawn(1)[0]
+        generator.vocabularies = self.vocabularies
+        generator.vocabulary_lock = self.vocabulary_lock
+        generator.times_of_day = self.times_of_day
+
+        return generator
+
+    def for_table(self, table: str, checkpoint: FillCheckpoint = None) -> "BatchGenerator":
+        # the numbers of a batch only depend on the seed, the table and the index of the batch
+        if self.seed is None:
+            raise ValueError("Only a seeded generator can generate batches by index")
+
+        generator = self.spawn()
+        generator.table_seed = zlib.crc32(table.encode())
+        generator.rng = np.random.default_rng([self.seed, generator.table_seed])
+        generator.checkpoint = checkpoint
+        generator.reference_date = checkpoint.started_on if checkpoint is not None else date.today()
+
+        return generator
+
+    def today(self) -> date:
+        return self.reference_date or date.today()
+
+    def now(self) -> datetime:
+        if self.reference_date is not None:
+            return datetime.combine(self.reference_date, time())
+
+        return datetime.now().replace(microsecond=0)
+
+    @property
+    def faker(self):
+        if self.__faker is None:
+            if self.seed is None:
+                return shared_faker()
+
+            # a seeded generator reseeds its faker for every vocabulary, other users of the shared one would see that
+            self.__faker = create_faker()
+
+        return self.__faker
+
+    def vocabulary(self, name: str, provider) -> np.ndarray:
+        if name not in self.vocabularies:
+            with self.vocabulary_lock:
+                if name not in self.vocabularies:
+                    if self.seed is not None:
+                        # seeded per vocabulary, so it does not matter which vocabularies were built before
+                        self.faker.seed_instance(f'{self.seed}:{name}')
+
+                    self.vocabularies[name] = np.array(
+                        [provider() for _ in range(self.vocabulary_size)],
+                        dtype=object
+                    )
+
+        return self.vocabularies[name]
+
+    def strings(self, name: str, provider, size: int) -> np.ndarray:
+        vocabulary = self.vocabulary(name, provider)
+
+        return vocabulary[self.rng.integers(0, len(vocabulary), size)]
+
+    def integers(self, low: int, high: int, size: int) -> np.ndarray:
+        return self.rng.integers(low, high, size, endpoint=True)
+
+    def uniform(self, low: float, high: float, size: int, decimals: int = 2) -> np.ndarray:
+        return np.round(self.rng.uniform(low, high, size), decimals)
+
+    def booleans(self, size: int, probability: float = 0.5) -> np.ndarray:
+        return self.rng.random(size) < probability
+
+    def choice(self, values, size: int) -> np.ndarray:
+        values = np.asarray(values)
+
+        return values[self.rng.integers(0, len(values), size)]
+
+    def dates(self, start: date, end: date, size: int) -> np.ndarray:
+        days = (end - start).days
+
+        return np.datetime64(start, "D") + self.rng.integers(0, days, size, endpoint=True)
+
+    def dates_after(self, starts: np.ndarray, end: date) -> np.ndarray:
+        days = (np.datetime64(end, "D") - starts).astype(np.int64)
+        offsets = np.floor(self.rng.random(len(starts)) * (np.maximum(days, 0) + 1)).astype(np.int64)
+
+        return starts + offsets
+
+    def datetimes(self, start: datetime, end: datetime, size: int) -> np.ndarray:
+        seconds = int((end - start).total_seconds())
+
+        return np.datetime64(start, "s") + self.rng.integers(0, seconds, size, endpoint=True)
+
+    def intervals(self, low: timedelta, high: timedelta, size: int, step: timedelta = timedelta(minutes=1)) -> np.ndarray:
+        steps = self.rng.integers(low // step, high // step, size, endpoint=True)
+
+        return steps * np.timedelta64(step)
+
+    def times(self, size: int) -> np.ndarray:
+        return self.times_at(self.rng.integers(0, SECONDS_IN_DAY, size))
+
+    def times_at(self, seconds: np.ndarray) -> np.ndarray:
+        if self.times_of_day is None:
+            self.times_of_day = np.array(
+                [time(second // 3600, second // 60 % 60, second % 60) for second in range(SECONDS_IN_DAY)],
+                dtype=object
+            )
+
+        return self.times_of_day[seconds % SECONDS_IN_DAY]
+
+    def blocks(self, count: int, block_size: int):
+        # (offset, size) of every batch, a checkpoint skips the batches it already has
+        for index, start in enumerate(range(0, count, block_size)):
+            if self.table_seed is not None:
+                if self.checkpoint is not None:
+                    if index in self.checkpoint.batches:
+                        continue
+
+                    self.checkpoint.start(index)
+                self.rng = np.random.default_rng([self.seed, self.table_seed, index])
+
+            yield start, min(block_size, count - start)
+
+    def block_sizes(self, count: int, block_size: int):
+        for _, size in self.blocks(count, block_size):
+            yield size
+
+    @staticmethod
+    def rows(*columns):
+        return zip(*[column.tolist() if isinstance(column, np.ndarray) else column for column in columns])
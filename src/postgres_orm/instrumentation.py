@@ -0,0 +1,185 @@
+import re
+import time
+from functools import lru_cache
+from threading import Lock
+
+import psycopg2.extensions
+
+
+# bucket n counts latencies below 2 ** n microseconds, the last one everything slower than a minute
+HISTOGRAM_BUCKETS = 27
+
+STRING_LITERALS = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERALS = re.compile(r"\b\d+(?:\.\d+)?\b")
+PARAMETER_LISTS = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(query: str) -> str:
+    query = STRING_LITERALS.sub("?", query)
+    query = NUMBER_LITERALS.sub("?", query.replace("%s", "?"))
+    query = PARAMETER_LISTS.sub("(...)", query)
+
+    return WHITESPACE.sub(" ", query).strip()
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.buckets[min(int(seconds * 1_000_000).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, snapshot: dict) -> None:
+        self.buckets = [count + other for count, other in zip(self.buckets, snapshot["buckets"])]
+        self.count += snapshot["count"]
+        self.total += snapshot["total"]
+        self.max = max(self.max, snapshot["max"])
+
+    def percentile(self, fraction: float) -> float:
+        # upper edge of the bucket holding the percentile, good to a factor of two
+        target = fraction * self.count
+        seen = 0
+
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min((1 << bucket) / 1_000_000, self.max)
+
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": list(self.buckets)
+        }
+
+
+class Instrumentation:
+    def __init__(self, callbacks: list = None):
+        self.callbacks = list(callbacks or [])
+        self.histograms = {}
+        self.statements = {}
+        self.tables = {}
+        self.round_trips = 0
+        self.db_seconds = 0.0
+        self.lock = Lock()
+
+    def subscribe(self, callback) -> None:
+        self.callbacks.append(callback)
+
+    def record(self, event: str, seconds: float, query: str = None, rows: int = None, table: str = None, **fields) -> None:
+        with self.lock:
+            if event not in self.histograms:
+                self.histograms[event] = LatencyHistogram()
+            self.histograms[event].add(seconds)
+
+            if query is not None:
+                self.round_trips += 1
+                self.db_seconds += seconds
+
+                statement = self.statements.setdefault(normalize_sql(query), {"count": 0, "seconds": 0.0, "rows": 0})
+                statement["count"] += 1
+                statement["seconds"] += seconds
+                statement["rows"] += max(rows or 0, 0)
+            elif event == "commit":
+                self.round_trips += 1
+                self.db_seconds += seconds
+
+            if table is not None:
+                totals = self.tables.setdefault(table, {})
+                for name, value in fields.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        totals[name] = totals.get(name, 0) + value
+
+        for callback in self.callbacks:
+            try:
+                callback(event, seconds, {"query": query, "rows": rows, "table": table, **fields})
+            except Exception as e:
+                print(f'Instrumentation callback {callback} failed: {e}')
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "round_trips": self.round_trips,
+                "db_seconds": self.db_seconds,
+                "latency": {event: histogram.snapshot() for event, histogram in self.histograms.items()},
+                "statements": {query: dict(statement) for query, statement in self.statements.items()},
+                "tables": {table: dict(totals) for table, totals in self.tables.items()}
+            }
+
+    def merge(self, snapshot: dict) -> None:
+        with self.lock:
+            self.round_trips += snapshot["round_trips"]
+            self.db_seconds += snapshot["db_seconds"]
+
+            for event, histogram in snapshot["latency"].items():
+                self.histograms.setdefault(event, LatencyHistogram()).merge(histogram)
+            for query, statement in snapshot["statements"].items():
+                totals = self.statements.setdefault(query, {"count": 0, "seconds": 0.0, "rows": 0})
+                for name, value in statement.items():
+                    totals[name] += value
+            for table, fields in snapshot["tables"].items():
+                totals = self.tables.setdefault(table, {})
+                for name, value in fields.items():
+                    totals[name] = totals.get(name, 0) + value
+
+    def reset(self) -> None:
+        with self.lock:
+            self.histograms = {}
+            self.statements = {}
+            self.tables = {}
+            self.round_trips = 0
+            self.db_seconds = 0.0
+
+
+# the classes below are only installed on connections of an instrumented ORM, a plain one never pays for them
+class InstrumentedConnection(psycopg2.extensions.connection):
+    instrumentation = None
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            self.instrumentation.record("commit", time.perf_counter() - start)
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self.connection.instrumentation.record("execute", time.perf_counter() - start, query=query, rows=self.rowcount)
+
+    def copy_expert(self, sql, file, size=8192):
+        start = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            self.connection.instrumentation.record("copy", time.perf_counter() - start, query=sql, rows=self.rowcount)
+
+    # a named cursor fetches from the server on every call, a plain one only reads its buffer
+    def fetchmany(self, size=None):
+        if self.name is None:
+            return super().fetchmany(self.arraysize if size is None else size)
+
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.connection.instrumentation.record("fetch", time.perf_counter() - start, query=f"FETCH FROM {self.query.decode()}", rows=len(rows))
+
+        return rows
@@ -0,0 +1,134 @@
+import numpy as np
+
+
+class IntervalIndex:
+    def __init__(self):
+        # per key the busy windows as sorted, disjoint [start, end) runs, touching windows merged
+        self.starts = {}
+        self.ends = {}
+        # per key a max tree over the gaps between runs, rebuilt on the first query after a change
+        self.gap_trees = {}
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.starts
+
+    def __len__(self) -> int:
+        return sum(len(starts) for starts in self.starts.values())
+
+    def windows(self, key: int) -> tuple[np.ndarray, np.ndarray]:
+        return self.starts.get(key, np.empty(0, dtype=np.int64)), self.ends.get(key, np.empty(0, dtype=np.int64))
+
+    def add(self, keys: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> None:
+        keys, starts, ends = np.asarray(keys, dtype=np.int64), np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+        if not len(keys):
+            return
+
+        order = np.argsort(keys, kind="stable")
+        keys, starts, ends = keys[order], starts[order], ends[order]
+        groups = np.flatnonzero(np.diff(keys)) + 1
+
+        for key, group_starts, group_ends in zip(keys[np.concatenate(([0], groups))].tolist(), np.split(starts, groups), np.split(ends, groups)):
+            if key in self.starts:
+                group_starts = np.concatenate((self.starts[key], group_starts))
+                group_ends = np.concatenate((self.ends[key], group_ends))
+
+            order = np.argsort(group_starts, kind="stable")
+            group_starts, group_ends = group_starts[order], group_ends[order]
+
+            # a window opens a new run unless it starts before every earlier window has ended
+            reach = np.maximum.accumulate(group_ends)
+            runs = np.concatenate(([0], np.flatnonzero(group_starts[1:] > reach[:-1]) + 1))
+
+            self.starts[key] = group_starts[runs]
+            self.ends[key] = np.maximum.reduceat(group_ends, runs)
+            self.gap_trees.pop(key, None)
+
+    def overlaps(self, key: int, start: int, end: int) -> bool:
+        starts, ends = self.windows(key)
+        run = int(np.searchsorted(ends, start, side="right"))
+
+        return run < len(starts) and int(starts[run]) < end
+
+    def busy_time(self, key: int, start: int, end: int) -> int:
+        starts, ends = self.windows(key)
+        first, last = np.searchsorted(ends, start, side="right"), np.searchsorted(starts, end, side="left")
+
+        return int((np.minimum(ends[first:last], end) - np.maximum(starts[first:last], start)).sum())
+
+    def __gap_tree(self, key: int) -> tuple[int, np.ndarray]:
+        if key not in self.gap_trees:
+            gaps = self.starts[key][1:] - self.ends[key][:-1]
+            size = 1 << max(len(gaps) - 1, 0).bit_length()
+
+            tree = np.full(2 * size, -1, dtype=np.int64)
+            tree[size:size + len(gaps)] = gaps
+            for level in range(size.bit_length() - 1, 0, -1):
+                first = 1 << (level - 1)
+                tree[first:2 * first] = np.maximum(tree[2 * first:4 * first:2], tree[2 * first + 1:4 * first:2])
+
+            self.gap_trees[key] = (size, tree)
+
+        return self.gap_trees[key]
+
+    def __first_gap(self, key: int, position: int, duration: int) -> int:
+        # the first gap at or after position that is at least duration long, -1 when there is none
+        size, tree = self.__gap_tree(key)
+        node = position + size
+        if tree[node] >= duration:
+            return position
+
+        while True:
+            if not node & 1 and tree[node + 1] >= duration:
+                node += 1
+
+                break
+
+            node >>= 1
+            if node <= 1:
+                return -1
+
+        while node < size:
+            node = 2 * node if tree[2 * node] >= duration else 2 * node + 1
+
+        return node - size
+
+    def find_free(self, key: int, after: int, duration: int) -> int:
+        # start of the first free window of at least duration that opens at or after `after`, O(log n)
+        if key not in self.starts:
+            return after
+
+        starts, ends = self.starts[key], self.ends[key]
+        run = int(np.searchsorted(ends, after, side="right"))
+        if run == len(starts):
+            return after
+        if int(starts[run]) - after >= duration:
+            return after
+        if run == len(starts) - 1:
+            return int(ends[run])
+
+        gap = self.__first_gap(key, run, duration)
+
+        return int(ends[gap]) if gap >= 0 else int(ends[-1])
+
+    def place(self, keys: np.ndarray, starts: np.ndarray, durations: np.ndarray) -> np.ndarray:
+        # every window goes to the first free slot at or after its wanted start, then joins the index
+        keys, starts, durations = np.asarray(keys, dtype=np.int64), np.asarray(starts, dtype=np.int64), np.asarray(durations, dtype=np.int64)
+        order = np.lexsort((starts, keys))
+        placed = np.empty(len(keys), dtype=np.int64)
+
+        groups = np.flatnonzero(np.diff(keys[order])) + 1
+        for positions in np.split(order, groups):
+            if not len(positions):
+                continue
+
+            key = int(keys[positions[0]])
+            # windows of a key are placed in the order they want to start, so they only ever need gaps of the index
+            last_end = None
+            for position, start, duration in zip(positions.tolist(), starts[positions].tolist(), durations[positions].tolist()):
+                start = self.find_free(key, start if last_end is None else max(start, last_end), duration)
+                placed[position] = start
+                last_end = start + duration
+
+        self.add(keys, placed, placed + durations)
+
+        return placed
@@ -0,0 +1,117 @@
+from array import array
+
+
+class SeatInventory:
+    def __init__(self, seat_numbers: list[str], seat_classes: list[str]):
+        self.seat_numbers = seat_numbers
+        self.seat_positions = {seat_number: position for position, seat_number in enumerate(seat_numbers)}
+        self.seats_per_flight = len(seat_numbers)
+
+        self.full_mask = (1 << self.seats_per_flight) - 1
+        self.class_masks = {}
+        for position, seat_class in enumerate(seat_classes):
+            self.class_masks[seat_class] = self.class_masks.get(seat_class, 0) | (1 << position)
+
+        self.flight_indexes = {}
+        self.flight_ids = array("q")
+        # one bitmap per flight, bit n set when seat_numbers[n] is taken
+        self.occupied = []
+        # seat ids of a flight are usually one contiguous block, so only its first id is kept
+        self.seat_bases = array("q")
+        self.scattered_seat_ids = {}
+        self.staged = set()
+
+    def __contains__(self, flight_id: int) -> bool:
+        return flight_id in self.flight_indexes
+
+    def __len__(self) -> int:
+        return len(self.flight_ids)
+
+    def __add_flight(self, flight_id: int, occupied: int, seat_ids: list[int]) -> int:
+        index = len(self.flight_ids)
+
+        self.flight_indexes[flight_id] = index
+        self.flight_ids.append(flight_id)
+        self.occupied.append(occupied)
+
+        if seat_ids and seat_ids[-1] - seat_ids[0] == len(seat_ids) - 1 and all(b - a == 1 for a, b in zip(seat_ids, seat_ids[1:])):
+            self.seat_bases.append(seat_ids[0])
+        else:
+            self.seat_bases.append(-1)
+            self.scattered_seat_ids[index] = array("q", seat_ids or [0] * self.seats_per_flight)
+
+        return index
+
+    def seat_id(self, index: int, position: int) -> int:
+        base = self.seat_bases[index]
+
+        return base + position if base >= 0 else self.scattered_seat_ids[index][position]
+
+    def stage_flights(self, flight_ids: list[int], seat_ids: list[int]) -> None:
+        for i, flight_id in enumerate(flight_ids):
+            self.__add_flight(flight_id, 0, seat_ids[i * self.seats_per_flight:(i + 1) * self.seats_per_flight])
+            self.staged.add(flight_id)
+
+    def load_seat(self, flight_id: int, seat_number: str, seat_id: int, occupied: bool) -> None:
+        index = self.flight_indexes.get(flight_id)
+        if index is None:
+            # seats missing from the table stay marked as taken
+            index = self.__add_flight(flight_id, self.full_mask, None)
+
+        position = self.seat_positions[seat_number]
+        self.scattered_seat_ids[index][position] = seat_id
+        if not occupied:
+            self.occupied[index] &= ~(1 << position)
+
+    def compact(self) -> None:
+        for index, seat_ids in list(self.scattered_seat_ids.items()):
+            if seat_ids[-1] - seat_ids[0] == len(seat_ids) - 1 and all(b - a == 1 for a, b in zip(seat_ids, seat_ids[1:])):
+                self.seat_bases[index] = seat_ids[0]
+                del self.scattered_seat_ids[index]
+
+    def allocate(self, flight_id: int, seat_class: str = None, choice: float = 0.0) -> int:
+        # choice in [0, 1) picks among the free seats in seat order, 0 takes the first one
+        index = self.flight_indexes[flight_id]
+
+        free = ~self.occupied[index] & self.class_masks.get(seat_class, self.full_mask)
+        if not free:
+            return None
+
+        # the rank-th free seat is the lowest position whose prefix holds more than rank free seats
+        rank = int(choice * free.bit_count())
+        low, high = 0, free.bit_length() - 1
+        while low < high:
+            middle = (low + high) // 2
+            if (free & ((2 << middle) - 1)).bit_count() > rank:
+                high = middle
+            else:
+                low = middle + 1
+
+        self.occupied[index] |= 1 << low
+
+        return self.seat_id(index, low)
+
+    def occupied_mask(self, flight_id: int) -> int:
+        return self.occupied[self.flight_indexes[flight_id]]
+
+    def seat_ids_in(self, flight_id: int, mask: int):
+        index = self.flight_indexes[flight_id]
+
+        while mask:
+            lowest = mask & -mask
+            mask ^= lowest
+
+            yield self.seat_id(index, lowest.bit_length() - 1)
+
+    def seat_rows(self, flight_ids: list[int]):
+        for flight_id in flight_ids:
+            index = self.flight_indexes[flight_id]
+            occupied = self.occupied[index]
+
+            for position, seat_number in enumerate(self.seat_numbers):
+                yield (
+                    self.seat_id(index, position),
+                    seat_number,
+                    "Occupied" if occupied >> position & 1 else "Available",
+                    flight_id
+                )
@@ -0,0 +1,49 @@
+import numpy as np
+
+
+# '?' is an uppercase letter and '#' a digit, like faker's bothify
+KEY_ALPHABETS = {
+    "?": (26, ord("A")),
+    "#": (10, ord("0"))
+}
+
+
+class KeySpace:
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.radices = np.array([KEY_ALPHABETS[symbol][0] for symbol in pattern], dtype=np.int64)
+        self.offsets = np.array([KEY_ALPHABETS[symbol][1] for symbol in pattern], dtype=np.int64)
+
+        # weight of every position when a key is read as a mixed-radix number
+        self.weights = np.ones(len(pattern), dtype=np.int64)
+        for position in range(len(pattern) - 2, -1, -1):
+            self.weights[position] = self.weights[position + 1] * self.radices[position + 1]
+
+        self.size = int(self.weights[0] * self.radices[0]) if len(pattern) else 1
+
+    def encode(self, keys) -> np.ndarray:
+        keys = [key for key in keys if isinstance(key, str) and len(key) == len(self.pattern)]
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+
+        digits = np.frombuffer("".join(keys).encode("ascii", "replace"), dtype=np.uint8).reshape(-1, len(self.pattern)) - self.offsets
+        valid = ((digits >= 0) & (digits < self.radices)).all(axis=1)
+
+        return np.unique(digits[valid] @ self.weights)
+
+    def decode(self, values: np.ndarray) -> list[str]:
+        digits = values[:, None] // self.weights % self.radices + self.offsets
+
+        return digits.astype(np.uint8).view(f"S{len(self.pattern)}").ravel().astype(f"U{len(self.pattern)}").tolist()
+
+    def sample(self, count: int, rng: np.random.Generator, existing=()) -> list[str]:
+        taken = self.encode(existing)
+        free = self.size - len(taken)
+        if count > free:
+            raise ValueError(f"Can not generate {count} unique {self.pattern} keys, only {free} of {self.size} are free")
+
+        values = np.sort(rng.choice(free, count, replace=False))
+        # shift every drawn rank past the taken keys below it, so the result never collides with them
+        values = values + np.searchsorted(taken - np.arange(len(taken)), values, side="right")
+
+        return self.decode(rng.permutation(values))
@@ -0,0 +1,67 @@
+# statements both clients run, {schema} is the schema name and {0}, {1}, ... the driver's placeholders in order
+
+from postgres_orm.schema import BULK_LOAD_JOURNAL
+
+# pg_constraint instead of information_schema: constraint names such as fk_flight_id repeat across tables
+FOREIGN_KEYS = """SELECT source.relname, target.relname FROM pg_constraint c
+                  JOIN pg_class source ON source.oid = c.conrelid
+                  JOIN pg_class target ON target.oid = c.confrelid
+                  JOIN pg_namespace n ON n.oid = source.relnamespace
+                  WHERE c.contype = 'f' AND n.nspname = {0}"""
+
+# foreign keys dropped by bulk_load still order the fill
+JOURNAL_FOREIGN_KEYS = f"SELECT table_name, reference FROM {{schema}}.{BULK_LOAD_JOURNAL} WHERE kind = 'constraint'"
+
+# first id, last id and number of the flights of every worker, split in flight id order
+FLIGHT_RANGES = """SELECT min(flight_id), max(flight_id), count(*) FROM (
+                       SELECT flight_id, ntile({0}) OVER (ORDER BY flight_id) AS part FROM {schema}.flight_data
+                   ) flights
+                   GROUP BY part ORDER BY part"""
+
+# the primary key pages through the flights, no cursor has to stay open across commits
+FLIGHT_CHUNK = "SELECT flight_id FROM {schema}.flight_data WHERE flight_id > {0} AND flight_id <= {1} ORDER BY flight_id LIMIT {2}"
+
+RANGE_HAS_SEATS = "SELECT EXISTS (SELECT 1 FROM {schema}.seats WHERE flight_id BETWEEN {0} AND {1})"
+
+RANGE_SEATS = "SELECT flight_id, seat_number, seat_id, seat_status = 'Occupied' FROM {schema}.seats WHERE flight_id BETWEEN {0} AND {1} ORDER BY flight_id"
+
+UNSEATED_FLIGHTS = "SELECT count(*) FROM {schema}.flight_data f WHERE NOT EXISTS (SELECT 1 FROM {schema}.seats s WHERE s.flight_id = f.flight_id)"
+
+# the counters move in the transaction of the seats, so a rolled back batch takes its counts with it
+COUNT_SEATS = """UPDATE {schema}.flight_data f
+                 SET number_of_passengers = f.number_of_passengers + d.passengers, available_seating = f.available_seating + d.available
+                 FROM unnest({0}::int[], {1}::int[], {2}::int[]) AS d(flight_id, passengers, available)
+                 WHERE f.flight_id = d.flight_id"""
+
+# only seats that really change count, their flights' counters move in the same statement
+OCCUPY_SEATS = """WITH occupied AS (
+                      UPDATE {schema}.seats SET seat_status = 'Occupied'
+                      WHERE seat_id = ANY({0}) AND seat_status <> 'Occupied'
+                      RETURNING flight_id
+                  ), deltas AS (
+                      SELECT flight_id, count(*) AS passengers FROM occupied GROUP BY flight_id
+                  )
+                  UPDATE {schema}.flight_data f
+                  SET number_of_passengers = f.number_of_passengers + d.passengers, available_seating = f.available_seating - d.passengers
+                  FROM deltas d WHERE f.flight_id = d.flight_id"""
+
+# one primary key lookup per flight, the counters are never recounted on read
+OCCUPANCY = "SELECT flight_id, number_of_passengers, available_seating FROM {schema}.flight_data WHERE flight_id = ANY({0})"
+
+# one pass over seats, only flights whose counters drifted are rewritten
+RECONCILE_OCCUPANCY = """UPDATE {schema}.flight_data f
+                         SET number_of_passengers = c.passengers, available_seating = c.available
+                         FROM (
+                             SELECT fd.flight_id,
+                                    count(s.seat_id) FILTER (WHERE s.seat_status = 'Occupied') AS passengers,
+                                    count(s.seat_id) FILTER (WHERE s.seat_status <> 'Occupied') AS available
+                             FROM {schema}.flight_data fd
+                             LEFT JOIN {schema}.seats s ON s.flight_id = fd.flight_id
+                             GROUP BY fd.flight_id
+                         ) c
+                         WHERE f.flight_id = c.flight_id
+                           AND (f.number_of_passengers, f.available_seating) IS DISTINCT FROM (c.passengers, c.available)"""
+
+
+def build_query(query: str, schema_name: str, *parameters: str) -> str:
+    return query.format(*parameters, schema=schema_name)
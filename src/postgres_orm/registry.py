@@ -0,0 +1,106 @@
+from array import array
+from threading import Lock
+
+import numpy as np
+
+
+class KeyRegistry:
+    def __init__(self):
+        self.keys = {}
+        self.object_views = {}
+        # an array can not grow while a NumPy view of it is alive, so adds and samples never overlap
+        self.lock = Lock()
+
+    def __contains__(self, table: str) -> bool:
+        return table in self.keys
+
+    def __len__(self) -> int:
+        return sum(self.count(table) for table in self.keys)
+
+    def count(self, table: str) -> int:
+        keys = self.keys.get(table, ())
+        if isinstance(keys, KeyRuns):
+            return keys.count
+
+        return len(keys)
+
+    def add(self, table: str, keys: list, integer_keys: bool = True) -> None:
+        with self.lock:
+            if table not in self.keys:
+                # serial keys are kept as runs of consecutive ids, so a table costs a few bytes per batch instead of per row
+                self.keys[table] = KeyRuns() if integer_keys else []
+
+            self.keys[table].extend(keys)
+
+            self.object_views.pop(table, None)
+
+    def get(self, table: str) -> np.ndarray:
+        with self.lock:
+            keys = self.keys[table]
+            if isinstance(keys, KeyRuns):
+                return keys.expand()
+
+            return self.__object_view(table)
+
+    def __object_view(self, table: str) -> np.ndarray:
+        if table not in self.object_views:
+            self.object_views[table] = np.array(self.keys[table], dtype=object)
+
+        return self.object_views[table]
+
+    def sample(self, table: str, size: int, rng: np.random.Generator) -> np.ndarray:
+        with self.lock:
+            return self.__sample(table, size, rng)
+
+    def __sample(self, table: str, size: int, rng: np.random.Generator) -> np.ndarray:
+        count = self.count(table)
+        if not count:
+            raise LookupError(f'No keys registered for {table}')
+
+        positions = rng.integers(0, count, size)
+
+        keys = self.keys[table]
+        if isinstance(keys, KeyRuns):
+            return keys.at(positions)
+
+        return self.__object_view(table)[positions]
+
+
+class KeyRuns:
+    def __init__(self):
+        self.starts = array("q")
+        # position of the first key of every run, when all runs are laid end to end
+        self.offsets = array("q")
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def extend(self, keys) -> None:
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(keys):
+            return
+
+        breaks = np.flatnonzero(np.diff(keys) != 1) + 1
+        starts = keys[np.concatenate(([0], breaks))]
+        offsets = np.concatenate(([0], breaks)) + self.count
+
+        # a batch that continues the last run does not open a new one
+        if self.starts and self.starts[-1] + self.count - self.offsets[-1] == starts[0]:
+            starts, offsets = starts[1:], offsets[1:]
+
+        self.starts.extend(starts.tolist())
+        self.offsets.extend(offsets.tolist())
+        self.count += len(keys)
+
+    def at(self, positions: np.ndarray) -> np.ndarray:
+        if not self.count:
+            return np.empty(0, dtype=np.int64)
+
+        offsets = np.frombuffer(self.offsets, dtype=np.int64)
+        runs = np.searchsorted(offsets, positions, side="right") - 1
+
+        return np.frombuffer(self.starts, dtype=np.int64)[runs] + positions - offsets[runs]
+
+    def expand(self) -> np.ndarray:
+        return self.at(np.arange(self.count, dtype=np.int64))
@@ -0,0 +1,355 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from postgres_orm.bulk import chunked
+from postgres_orm.generators import SECONDS_IN_DAY, BatchGenerator
+from postgres_orm.intervals import IntervalIndex
+from postgres_orm.inventory import SeatInventory
+from postgres_orm.keys import KeySpace
+from postgres_orm.schedule import DEPARTURE_STEP, AircraftRotation, expand_schedule
+
+
+AIRPORT_CODES = KeySpace("???")
+FLIGHT_NUMBERS = KeySpace("??####")
+
+# columns every filler writes, a serial primary key is left to the writer
+TABLE_COLUMNS = {
+    "airlines": ("airline_name",),
+    "airports": ("airport_id", "airport_name", "airport_city", "airport_country"),
+    "customers": ("name", "email", "phone_number", "address"),
+    "reporteurs": ("reporteur_class", "reporteur_name"),
+    "aircrafts": ("aircraft_type", "aircraft_company", "aircraft_capacity"),
+    "flights": ("flight_number", "origin", "destination", "airline_id", "flight_length"),
+    "flight_data": ("flight_number", "aircraft_registration_number", "flight_status_id", "problem_id", "number_of_passengers", "number_of_cabin_crew", "number_of_flight_crew", "available_seating", "scheduled_departure_date", "scheduled_departure_time"),
+    "seat_classes": ("seat_number", "seat_class"),
+    "seats": ("seat_id", "seat_number", "seat_status", "flight_id"),
+    "bookings": ("flight_id", "customer_id", "seat_id", "price", "payment_status"),
+    "maintenance_events": ("aircraft_registration_number", "maintenance_starttime", "duration", "airport_id", "subsystem_id", "maintenance_type_id"),
+    "aircraft_slots": ("aircraft_registration_number", "slot_start", "slot_end", "slot_type", "slot_scheduled", "maintenance_id"),
+    "work_orders": ("aircraft_registration_number", "maintenance_id", "airport_id", "execution_date", "scheduled", "forecasted_date", "forecasted_manhours", "frequency", "reporteur_id", "due_date", "reporting_date"),
+    "subsystems": ("subsystem_type",),
+    "maintenance_types": ("maintenance_type_name",),
+    "flight_statuses": ("flight_status_type",),
+    "problems": ("problem_type",)
+}
+
+# tables whose keys a filler samples, they have to be known before its rows are generated
+SAMPLED_KEYS = {
+    "flights": ("airports", "airlines"),
+    "flight_data": ("flights", "aircrafts", "flight_statuses", "problems"),
+    "bookings": ("customers",),
+    "maintenance_events": ("aircrafts", "airports", "subsystems", "maintenance_types"),
+    "aircraft_slots": ("aircrafts", "maintenance_events"),
+    "work_orders": ("aircrafts", "maintenance_events", "airports", "reporteurs")
+}
+
+# per table the aircraft and the start and end of its windows, as SQL expressions
+WINDOW_COLUMNS = {
+    "maintenance_events": ("aircraft_registration_number", "maintenance_starttime", "maintenance_starttime + duration"),
+    "aircraft_slots": ("aircraft_registration_number", "slot_start", "slot_end")
+}
+
+AIRCRAFT_TYPES = ['Boeing 737', 'Airbus A320', 'Boeing 777', 'Airbus A350']
+REPORTEUR_CLASSES = ["Steward", "Pilot", "Mechanic"]
+SLOT_TYPES = ["Maintenance", "Cleaning", "Inspection", "Repair"]
+SUBSYSTEM_TYPES = ["Engine", "Avionics", "Hydraulics", "Landing Gear", "Fuel System", "Electrical System"]
+MAINTENANCE_TYPE_NAMES = ["Routine Check", "Engine Repair", "Scheduled Maintenance", "Emergency Repair", "Software Update"]
+FLIGHT_STATUSES = [
+    "Cancelled",
+    "Delayed",
+    "On-time"
+]
+PROBLEM_TYPES = [
+    "Everything Ok"
+    "Engine Failure",
+    "Avionics Issue",
+    "Fuel System Leak",
+    "Hydraulic Failure",
+    "Tire Damage",
+    "Wing Deformity",
+    "Sensor Malfunction",
+    "Landing Gear Issue",
+    "Cabin Pressure Problem",
+    "Electrical System Issue"
+]
+
+
+def seat_map() -> list[tuple[str, str]]:
+    rows = range(1, 41)
+    seat_letters = ["A", "B", "C", "D", "E", "F"]
+    seat_classes = []
+
+    for row in rows:
+        for letter in seat_letters:
+            seat_number = f"{row}{letter}"
+            seat_class =  "Business" if row <= 3 else "First Class" if row <= 6 else "Economy"
+
+            seat_classes.append((seat_number, seat_class))
+
+    return seat_classes
+
+
+def lookup_rows(table: str) -> list[tuple]:
+    values = {
+        "subsystems": SUBSYSTEM_TYPES,
+        "maintenance_types": MAINTENANCE_TYPE_NAMES,
+        "flight_statuses": FLIGHT_STATUSES,
+        "problems": PROBLEM_TYPES
+    }
+
+    if table == "seat_classes":
+        return seat_map()
+
+    return [(value,) for value in values[table]]
+
+
+# sample_keys(table, size) draws keys of an already filled table, like KeyRegistry.sample
+
+def airline_rows(generator: BatchGenerator, fillings: int, batch_size: int):
+    for size in generator.block_sizes(fillings, batch_size):
+        yield from generator.rows(
+            generator.strings("airline_name", lambda: f'{generator.faker.company()} Air', size)
+        )
+
+
+def customer_rows(generator: BatchGenerator, fillings: int, batch_size: int):
+    for size in generator.block_sizes(fillings, batch_size):
+        yield from generator.rows(
+            generator.strings("name", generator.faker.name, size),
+            generator.strings("email", lambda: generator.faker.email(domain="google.com"), size),
+            generator.strings("phone_number", generator.faker.phone_number, size),
+            generator.strings("address", generator.faker.address, size)
+        )
+
+
+def reporteur_rows(generator: BatchGenerator, fillings: int, batch_size: int):
+    for size in generator.block_sizes(fillings, batch_size):
+        yield from generator.rows(
+            generator.choice(REPORTEUR_CLASSES, size),
+            generator.strings("reporteur_name", generator.faker.name, size)
+        )
+
+
+def aircraft_rows(generator: BatchGenerator, fillings: int, batch_size: int):
+    for size in generator.block_sizes(fillings, batch_size):
+        yield from generator.rows(
+            generator.choice(AIRCRAFT_TYPES, size),
+            generator.strings("aircraft_company", generator.faker.company, size),
+            np.full(size, 300) #generator.integers(100, 400, size)
+        )
+
+
+def airport_rows(generator: BatchGenerator, airport_ids: list[str], batch_size: int):
+    for start, count in generator.blocks(len(airport_ids), batch_size):
+        codes = airport_ids[start:start + count]
+
+        yield from generator.rows(
+            codes,
+            generator.strings("airport_name", lambda: f'{generator.faker.company()} Airport', count),
+            generator.strings("airport_city", generator.faker.city, count),
+            generator.strings("airport_country", generator.faker.country, count)
+        )
+
+
+def flight_rows(generator: BatchGenerator, sample_keys, flight_numbers: list[str], batch_size: int):
+    for start, size in generator.blocks(len(flight_numbers), batch_size):
+        numbers = flight_numbers[start:start + size]
+
+        yield from generator.rows(
+            numbers,
+            sample_keys("airports", size),
+            sample_keys("airports", size),
+            sample_keys("airlines", size),
+            generator.intervals(timedelta(hours=1), timedelta(hours=10, minutes=59), size)
+        )
+
+
+def flight_data_batch(generator: BatchGenerator, sample_keys, flight_statuses: np.ndarray, problem_ids: np.ndarray, flight_numbers, aircraft_reg: np.ndarray, departure_dates: np.ndarray, departure_times: np.ndarray):
+    size = len(aircraft_reg)
+    # a flight starts without seats, the counters follow its occupied and available seats from then on
+    number_of_passangers = np.zeros(size, dtype=np.int64)
+    available_seating = np.zeros(size, dtype=np.int64)
+
+    fake_status_id_number = generator.rng.random(size)
+    fligt_status = np.where(
+        fake_status_id_number >= 0.8,
+        np.where(fake_status_id_number <= 0.95, flight_statuses[1], flight_statuses[2]),
+        flight_statuses[0]
+    )
+
+    problem_id = np.where(
+        generator.booleans(size, 0.8),
+        problem_ids[0],
+        sample_keys("problems", size)
+    )
+
+    return generator.rows(
+        flight_numbers,
+        aircraft_reg,
+        fligt_status,
+        problem_id,
+        number_of_passangers,
+        generator.integers(1, 9, size),
+        generator.integers(1, 9, size),
+        available_seating,
+        departure_dates,
+        departure_times
+    )
+
+
+def flight_data_rows(generator: BatchGenerator, sample_keys, flight_statuses: np.ndarray, problem_ids: np.ndarray, fillings: int, batch_size: int):
+    today = generator.today()
+
+    for size in generator.block_sizes(fillings, batch_size):
+        yield from flight_data_batch(
+            generator,
+            sample_keys,
+            flight_statuses,
+            problem_ids,
+            sample_keys("flights", size),
+            sample_keys("aircrafts", size),
+            generator.dates(today, today + timedelta(days=365), size),
+            generator.times(size)
+        )
+
+
+def flight_schedule_rows(generator: BatchGenerator, sample_keys, flight_statuses: np.ndarray, problem_ids: np.ndarray, flight_numbers: list[str], flight_seconds: np.ndarray, rotation: AircraftRotation, start: date, days: int, weekdays: tuple[int], batch_size: int):
+    flight_numbers = np.array(flight_numbers, dtype=object)
+    # every flight number leaves at the same time on each day it flies
+    departure_seconds = generator.integers(0, SECONDS_IN_DAY // DEPARTURE_STEP - 1, len(flight_numbers)) * DEPARTURE_STEP
+
+    for flights, departures, aircraft_reg in expand_schedule(departure_seconds, flight_seconds, rotation, start, days, weekdays, batch_size):
+        yield from flight_data_batch(
+            generator,
+            sample_keys,
+            flight_statuses,
+            problem_ids,
+            flight_numbers[flights],
+            aircraft_reg,
+            (departures // SECONDS_IN_DAY).astype("datetime64[D]"),
+            generator.times_at(departures)
+        )
+
+
+def place_windows(index: IntervalIndex, aircraft_reg: np.ndarray, wanted_starts: np.ndarray, durations: np.ndarray) -> np.ndarray:
+    # windows move to the first time their aircraft is free, so no aircraft ever has two at once
+    starts = index.place(aircraft_reg, wanted_starts.astype(np.int64), durations // np.timedelta64(1, "s"))
+
+    return starts.astype("datetime64[s]")
+
+
+def maintenance_event_rows(generator: BatchGenerator, sample_keys, index: IntervalIndex, fillings: int, batch_size: int):
+    now = generator.now()
+
+    for size in generator.block_sizes(fillings, batch_size):
+        aircraft_reg = sample_keys("aircrafts", size)
+        duration = generator.intervals(timedelta(hours=1), timedelta(hours=12), size, step=timedelta(hours=1))
+
+        yield from generator.rows(
+            aircraft_reg,
+            place_windows(index, aircraft_reg, generator.datetimes(now - timedelta(days=365), now, size), duration),
+            duration,
+            sample_keys("airports", size),
+            sample_keys("subsystems", size),
+            sample_keys("maintenance_types", size)
+        )
+
+
+def aircraft_slot_rows(generator: BatchGenerator, sample_keys, index: IntervalIndex, fillings: int, batch_size: int):
+    now = generator.now()
+
+    for size in generator.block_sizes(fillings, batch_size):
+        aircraft_reg = sample_keys("aircrafts", size)
+        duration = generator.intervals(timedelta(hours=1), timedelta(hours=12), size, step=timedelta(hours=1))  # Добавляем от 1 до 12 часов
+        start_time = place_windows(index, aircraft_reg, generator.datetimes(now - timedelta(days=365), now, size), duration)
+
+        yield from generator.rows(
+            aircraft_reg,
+            start_time,
+            start_time + duration,
+            generator.choice(SLOT_TYPES, size),
+            generator.booleans(size),
+            sample_keys("maintenance_events", size)
+        )
+
+
+def work_order_rows(generator: BatchGenerator, sample_keys, fillings: int, batch_size: int):
+    today = generator.today()
+    next_year = today + timedelta(days=365)
+
+    for size in generator.block_sizes(fillings, batch_size):
+        reporting_date = generator.dates(today - timedelta(days=730), today, size)
+        forecasted_date = generator.dates_after(reporting_date, next_year)
+        due_date = generator.dates_after(forecasted_date, next_year)
+        execution_date = generator.dates_after(reporting_date, next_year)
+
+        yield from generator.rows(
+            sample_keys("aircrafts", size),
+            sample_keys("maintenance_events", size),
+            sample_keys("airports", size),
+            execution_date,
+            generator.booleans(size),
+            forecasted_date,
+            generator.integers(1, 9, size),
+            generator.integers(1, 9, size),
+            sample_keys("reporteurs", size),
+            due_date,
+            reporting_date
+        )
+
+
+def allocate_bookings(inventory: SeatInventory, flight_ids: list[int], count: int, generator: BatchGenerator) -> dict[int, int]:
+    # only the bitmaps from before the allocation are kept, the booked seats are the bits set since
+    before = {}
+
+    bookings_per_flight = generator.rng.multinomial(count, np.full(len(flight_ids), 1 / len(flight_ids)))
+    for flight_id, bookings in zip(flight_ids, bookings_per_flight.tolist()):
+        before[flight_id] = inventory.occupied_mask(flight_id)
+        # every booking takes a free seat at random, not the first free one
+        for choice in generator.rng.random(bookings).tolist():
+            if inventory.allocate(flight_id, choice=choice) is None:
+                break
+
+    return before
+
+
+def booked_seats(inventory: SeatInventory, flight_ids: list[int], before: dict[int, int]):
+    for flight_id in flight_ids:
+        for seat_id in inventory.seat_ids_in(flight_id, inventory.occupied_mask(flight_id) & ~before[flight_id]):
+            yield flight_id, seat_id
+
+
+def booking_rows(generator: BatchGenerator, sample_keys, seats, batch_size: int):
+    for chunk in chunked(seats, batch_size):
+        size = len(chunk)
+
+        yield from generator.rows(
+            [flight_id for flight_id, _ in chunk],
+            sample_keys("customers", size),
+            [seat_id for _, seat_id in chunk],
+            generator.uniform(50, 1000, size),
+            generator.booleans(size)
+        )
+
+
+def book_chunk(inventory: SeatInventory, flight_ids: list[int], count: int, generator: BatchGenerator, sample_keys, batch_size: int) -> tuple[list[tuple], list[tuple], list[int]]:
+    # staged seats are written with their final status, seats written before only have theirs updated
+    before = allocate_bookings(inventory, flight_ids, count, generator)
+    seats = list(inventory.seat_rows([flight_id for flight_id in flight_ids if flight_id in inventory.staged]))
+    bookings = list(booking_rows(generator, sample_keys, booked_seats(inventory, flight_ids, before), batch_size))
+    occupied = [seat_id for _, seat_id in booked_seats(inventory, [flight_id for flight_id in flight_ids if flight_id not in inventory.staged], before)]
+
+    return seats, bookings, occupied
+
+
+def booking_groups(seats: list[tuple], bookings: list[tuple], occupied: list[int]):
+    # the row policy's transactions: every booking with its seat, then the seats nobody booked one by one
+    new_seats = {seat[0]: seat for seat in seats}
+
+    for booking in bookings:
+        seat = new_seats.pop(booking[2], None)
+        yield ([seat], [booking], []) if seat is not None else ([], [booking], [booking[2]])
+
+    for seat in new_seats.values():
+        yield [seat], [], []
@@ -0,0 +1,34 @@
+# rows of every table at scale factor 1, the other scale factors multiply them
+SCALE_FACTOR_ROWS = {
+    "airlines": 10,
+    "airports": 100,
+    "customers": 10_000,
+    "reporteurs": 500,
+    "aircrafts": 200,            # 20 per airline
+    "flights": 500,              # 50 flight numbers per airline
+    "flight_data": 5_000,        # 10 departures per flight number
+    "seats": 5_000,              # one seat map per departure, the row count follows flight_data
+    "bookings": 750_000,         # 150 per departure, 62.5% of the 240 seats
+    "maintenance_events": 1_000, # 5 per aircraft
+    "aircraft_slots": 1_000,     # 5 per aircraft
+    "work_orders": 2_000,        # 10 per aircraft
+    # lookup tables always get their fixed rows
+    "flight_statuses": 1,
+    "problems": 1,
+    "seat_classes": 1,
+    "subsystems": 1,
+    "maintenance_types": 1
+}
+
+
+def scale_fillings(scale_factor: float, limits: dict[str, int] = None) -> dict[str, int]:
+    if scale_factor <= 0:
+        raise ValueError('scale_factor must be positive')
+
+    fillings = {table: max(1, round(rows * scale_factor)) for table, rows in SCALE_FACTOR_ROWS.items()}
+    for table, limit in (limits or {}).items():
+        if fillings.get(table, 0) > limit:
+            print(f'Capping {table} at {limit} rows, the key space has no more unique keys')
+            fillings[table] = limit
+
+    return fillings
@@ -0,0 +1,81 @@
+from datetime import date
+from heapq import heapify, heapreplace
+
+import numpy as np
+
+from postgres_orm.generators import SECONDS_IN_DAY
+
+
+# Monday is 0, like date.weekday()
+DAILY = (0, 1, 2, 3, 4, 5, 6)
+WORKDAYS = (0, 1, 2, 3, 4)
+DEPARTURE_STEP = 5 * 60
+
+
+def add_months(start: date, months: int) -> date:
+    month = np.datetime64(start, "M") + months
+    days_in_month = ((month + 1).astype("datetime64[D]") - month.astype("datetime64[D]")).astype(np.int64)
+
+    return (month.astype("datetime64[D]") + min(start.day, days_in_month) - 1).astype(date)
+
+
+class AircraftRotation:
+    def __init__(self, aircraft_ids: np.ndarray, turnaround: int, available_from: dict[int, int] = None):
+        if not len(aircraft_ids):
+            raise LookupError("No aircrafts to schedule, aircrafts have to be filled first")
+
+        self.turnaround = turnaround
+        self.unassigned = 0
+
+        # (second the aircraft is free again, aircraft), the aircraft idle the longest is always on top
+        self.heap = [((available_from or {}).get(aircraft_id, 0), aircraft_id) for aircraft_id in aircraft_ids.tolist()]
+        heapify(self.heap)
+
+    def assign(self, departures: np.ndarray, arrivals: np.ndarray) -> np.ndarray:
+        # departures have to come in time order, across calls too
+        heap = self.heap
+        turnaround = self.turnaround
+        assigned = []
+
+        for departure, arrival in zip(departures.tolist(), arrivals.tolist()):
+            free_at, aircraft_id = heap[0]
+            if free_at > departure:
+                # every aircraft is still in the air, the departure is dropped instead of double booking one
+                assigned.append(-1)
+
+                continue
+
+            heapreplace(heap, (arrival + turnaround, aircraft_id))
+            assigned.append(aircraft_id)
+
+        assigned = np.array(assigned, dtype=np.int64)
+        self.unassigned += int((assigned < 0).sum())
+
+        return assigned
+
+
+def expand_schedule(departure_seconds: np.ndarray, flight_seconds: np.ndarray, rotation: AircraftRotation, start: date, days: int, weekdays: tuple[int] = DAILY, batch_size: int = 10_000):
+    # yields (flight positions, departures as seconds since 1970, aircrafts) in time order, about batch_size departures at a time
+    weekday_mask = np.zeros(7, dtype=bool)
+    weekday_mask[list(weekdays)] = True
+
+    days_per_block = max(1, batch_size // max(1, len(departure_seconds)))
+    first_day = np.datetime64(start, "D").astype(np.int64)
+
+    for offset in range(0, days, days_per_block):
+        day_numbers = first_day + np.arange(offset, min(offset + days_per_block, days), dtype=np.int64)
+        # 1970-01-01 was a Thursday
+        day_numbers = day_numbers[weekday_mask[(day_numbers + 3) % 7]]
+        if not len(day_numbers):
+            continue
+
+        departures = (day_numbers[:, None] * SECONDS_IN_DAY + departure_seconds[None, :]).ravel()
+        flights = np.tile(np.arange(len(departure_seconds)), len(day_numbers))
+
+        order = np.argsort(departures, kind="stable")
+        departures, flights = departures[order], flights[order]
+
+        aircraft_ids = rotation.assign(departures, departures + flight_seconds[flights])
+        scheduled = aircraft_ids >= 0
+
+        yield flights[scheduled], departures[scheduled], aircraft_ids[scheduled]
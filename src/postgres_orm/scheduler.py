@@ -0,0 +1,112 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+def build_dependency_graph(tables, foreign_keys: dict[str, set[str]]) -> dict[str, set[str]]:
+    tables = set(tables)
+
+    return {
+        table: {reference for reference in foreign_keys.get(table, set()) if reference in tables and reference != table}
+        for table in tables
+    }
+
+
+
+def order_dependency_graph(dependencies: dict[str, set[str]]) -> list[str]:
+    pending = {table: set(references) for table, references in dependencies.items()}
+    order = []
+
+    while pending:
+        ready = sorted(table for table, references in pending.items() if references <= set(order))
+        if not ready:
+            raise ValueError(f'Foreign key cycle between {", ".join(sorted(pending))}')
+
+        for table in ready:
+            pending.pop(table)
+        order.extend(ready)
+
+    return order
+
+
+def group_dependency_graph(dependencies: dict[str, set[str]], joined: dict[str, str] = None) -> dict[tuple[str], set[str]]:
+    # a table joined to another one is filled right before it, by the same worker
+    joined = {table: partner for table, partner in (joined or {}).items() if table in dependencies and partner in dependencies}
+
+    units = {}
+    for table, references in dependencies.items():
+        if table in joined:
+            continue
+
+        unit = (*[member for member, partner in joined.items() if partner == table], table)
+        units[unit] = set().union(*[dependencies[member] for member in unit]) - set(unit)
+
+    return units
+
+
+def fill_worker(connection_params: dict, tables: tuple[str], fillings: dict[str, int], instrumented: bool = False) -> tuple[dict[str, bool], dict]:
+    from postgres_orm import PostgresORM
+    from postgres_orm.instrumentation import Instrumentation
+
+    # callbacks can not cross the process boundary, the worker sends back a snapshot instead
+    orm = PostgresORM(**connection_params, instrumentation=Instrumentation() if instrumented else None)
+    # seats of a unit that also books them are written once, by the bookings fill
+    orm.defer_seats = "bookings" in tables
+    results = {}
+    try:
+        for table in tables:
+            failed = [member for member, fill in results.items() if not fill]
+            if failed:
+                print(f'Skipping {table}, {", ".join(failed)} failed before it')
+                results[table] = False
+            else:
+                results[table] = orm.fill_table(table=table, fillings=fillings[table])
+    finally:
+        # close writes the seats no bookings fill wrote and raises when they fail, which fails the whole unit
+        orm.close()
+
+    return results, orm.instrumentation.snapshot() if instrumented else None
+
+
+def run_dependency_graph(dependencies: dict[str, set[str]], connection_params: dict, fillings: int | dict[str, int], workers: int = None, instrumentation=None, joined: dict[str, str] = None) -> dict[str, bool]:
+    if not isinstance(fillings, dict):
+        fillings = {table: fillings for table in dependencies}
+
+    # the process machinery of multiprocessing is only imported by fills that use it
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    pending = group_dependency_graph(dependencies, joined)
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+        running = {}
+
+        while pending or running:
+            ready = [unit for unit, references in pending.items() if references <= results.keys()]
+            for unit in ready:
+                references = pending.pop(unit)
+                failed = [reference for reference in references if not results[reference]]
+                if failed:
+                    print(f'Skipping {", ".join(unit)}, dependencies failed: {", ".join(sorted(failed))}')
+                    results.update({table: False for table in unit})
+                else:
+                    running[executor.submit(fill_worker, connection_params, unit, {table: fillings[table] for table in unit}, instrumentation is not None)] = unit
+
+            if ready and not running:
+                continue
+
+            if not running:
+                raise ValueError(f'Foreign key cycle between {", ".join(sorted(table for unit in pending for table in unit))}')
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                unit = running.pop(future)
+                try:
+                    unit_results, snapshot = future.result()
+                    results.update(unit_results)
+                    if snapshot is not None:
+                        instrumentation.merge(snapshot)
+                except Exception as e:
+                    print(f'Worker filling {", ".join(unit)} failed: {e}')
+                    results.update({table: False for table in unit})
+
+    return results
@@ -0,0 +1,37 @@
+# constraints and indexes dropped by bulk_load are recorded here until they are restored
+BULK_LOAD_JOURNAL = "bulk_load_journal"
+# batches committed by checkpointed fills
+FILL_PROGRESS = "fill_progress"
+
+# tables, column types and primary keys in one round trip, pg_index is far cheaper than information_schema's constraint views
+# {parameter} is the driver's placeholder for the schema name
+SCHEMA_QUERY = f"""SELECT c.table_name, c.column_name, c.data_type, pk.attname IS NOT NULL
+                   FROM information_schema.columns c
+                   LEFT JOIN (
+                       SELECT i.indrelid, a.attname FROM pg_index i
+                       JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+                       WHERE i.indisprimary
+                   ) pk ON pk.indrelid = (quote_ident(c.table_schema) || '.' || quote_ident(c.table_name))::regclass AND pk.attname = c.column_name
+                   WHERE c.table_schema = {{parameter}} AND c.table_name NOT IN ('{BULK_LOAD_JOURNAL}', '{FILL_PROGRESS}')
+                   ORDER BY c.table_name, c.ordinal_position"""
+
+# snapshots by (host, port, db_name, schema_name), shared by every ORM of the process
+SCHEMA_SNAPSHOTS = {}
+
+
+class SchemaSnapshot:
+    def __init__(self, rows: list[tuple]):
+        self.tables = []
+        self.primary_keys = {}
+        self.column_types = {}
+
+        for table, column, data_type, primary_key in rows:
+            if table not in self.column_types:
+                self.tables.append(table)
+            self.column_types.setdefault(table, {})[column] = data_type
+            if primary_key:
+                self.primary_keys[table] = column
+
+
+def schema_query(parameter: str) -> str:
+    return SCHEMA_QUERY.format(parameter=parameter)